@@ -1,13 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
+from itertools import count
 from PIL import Image, ImageTk
 import os
 
 import database as db
+from db_async import AsyncDatabase
+from task_runner import TaskRunner, TaskCancelled
+from virtual_tree import VirtualTreeview
+from packing import get_carton_capacity, get_product_type, pack_cartons
+from local_store import LocalStore, HistoryWriter
 from barcode_generator import BarcodeGenerator
 from printer import TSCPrinter, print_barcode_label
-from config import SHORT_DATE_FORMAT
+from config import SHORT_DATE_FORMAT, DATABASE_CONFIG
 
 # Try to import reportlab for PDF export
 try:
@@ -62,164 +68,23 @@ PRODUCT_CODES = {
     "LAPB NVYB": "LAPTOP BAG NAVY BLUE",
 }
 
-# Carton capacity per product type (items per carton)
-CARTON_CAPACITIES = {
-    "WALT": 150,      # Wallet - 150 per carton
-    "4PCS": 80,       # 4PC Set - 80 per carton
-    "LAPB": 12,       # Laptop Bag - 12 per carton
-}
+def iter_cart_labels(cart_items):
+    """Yield (item, serial, barcode_data) for every label in the cart, in print order.
 
-def get_carton_capacity(product_code):
-    """Get carton capacity for a product based on its code prefix."""
-    for prefix, capacity in CARTON_CAPACITIES.items():
-        if product_code.startswith(prefix):
-            return capacity
-    return 100  # Default capacity
-
-def get_product_type(product_code):
-    """Get product type prefix for grouping (WALT, 4PCS, LAPB, or OTHER)."""
-    for prefix in CARTON_CAPACITIES.keys():
-        if product_code.startswith(prefix):
-            return prefix
-    return "OTHER"
-
-def pack_cartons_smart(cart_items):
-    """Pack items into cartons with smart mixing.
-
-    Strategy:
-    1. Group items by product type (WALT, 4PCS, LAPB, etc.)
-    2. For each type, first fill complete cartons with single products
-    3. Collect remaining items that don't fill a complete carton
-    4. Mix remaining items of same type into shared cartons
-
-    Returns list of carton dicts, each containing:
-    - items: list of {product_code, product_name, start_serial, end_serial, quantity, location_code}
-    - capacity: carton capacity
-    - total_quantity: total items in carton
-    - is_mixed: True if carton contains multiple products
+    Labels are produced from each item's serial range on demand, so memory
+    does not grow with the size of the cart.
     """
-    from collections import defaultdict
-
-    # Group cart items by product type
-    items_by_type = defaultdict(list)
     for item in cart_items:
-        product_type = get_product_type(item['product']['code'])
-        items_by_type[product_type].append(item)
-
-    all_cartons = []
+        prefix = f"{item['location']['code']}-{item['product']['code']}-"
+        for serial in range(item['start_serial'], item['end_serial'] + 1):
+            yield item, serial, f"{prefix}{serial:04d}"
 
-    for product_type, items in items_by_type.items():
-        capacity = get_carton_capacity(items[0]['product']['code'])
-        remainders = []  # Items that don't fill a complete carton
 
-        # Process each item - fill complete cartons first
-        for item in items:
-            product_code = item['product']['code']
-            product_name = item['product']['name']
-            location_code = item['location']['code']
-            start_serial = item['start_serial']
-            end_serial = item['end_serial']
-
-            current_serial = start_serial
-
-            # Fill complete cartons with this single product
-            while current_serial <= end_serial:
-                remaining_qty = end_serial - current_serial + 1
-
-                if remaining_qty >= capacity:
-                    # Full carton with single product
-                    carton_end = current_serial + capacity - 1
-                    all_cartons.append({
-                        'items': [{
-                            'product_code': product_code,
-                            'product_name': product_name,
-                            'start_serial': current_serial,
-                            'end_serial': carton_end,
-                            'quantity': capacity,
-                            'location_code': location_code
-                        }],
-                        'capacity': capacity,
-                        'total_quantity': capacity,
-                        'is_mixed': False,
-                        'product_type': product_type
-                    })
-                    current_serial = carton_end + 1
-                else:
-                    # Remainder - save for mixing
-                    remainders.append({
-                        'product_code': product_code,
-                        'product_name': product_name,
-                        'start_serial': current_serial,
-                        'end_serial': end_serial,
-                        'quantity': remaining_qty,
-                        'location_code': location_code
-                    })
-                    break
-
-        # Now pack remainders into mixed cartons
-        if remainders:
-            current_carton_items = []
-            current_carton_qty = 0
-
-            for remainder in remainders:
-                remaining_to_pack = remainder['quantity']
-                current_start = remainder['start_serial']
-
-                while remaining_to_pack > 0:
-                    space_in_carton = capacity - current_carton_qty
-
-                    if remaining_to_pack <= space_in_carton:
-                        # Fits in current carton
-                        current_carton_items.append({
-                            'product_code': remainder['product_code'],
-                            'product_name': remainder['product_name'],
-                            'start_serial': current_start,
-                            'end_serial': current_start + remaining_to_pack - 1,
-                            'quantity': remaining_to_pack,
-                            'location_code': remainder['location_code']
-                        })
-                        current_carton_qty += remaining_to_pack
-                        remaining_to_pack = 0
-                    else:
-                        # Fill current carton, continue with next
-                        if space_in_carton > 0:
-                            current_carton_items.append({
-                                'product_code': remainder['product_code'],
-                                'product_name': remainder['product_name'],
-                                'start_serial': current_start,
-                                'end_serial': current_start + space_in_carton - 1,
-                                'quantity': space_in_carton,
-                                'location_code': remainder['location_code']
-                            })
-                            current_start += space_in_carton
-                            remaining_to_pack -= space_in_carton
-
-                        # Save current carton and start new one
-                        is_mixed = len(current_carton_items) > 1 or (
-                            len(current_carton_items) == 1 and
-                            current_carton_items[0]['quantity'] < capacity
-                        )
-                        all_cartons.append({
-                            'items': current_carton_items,
-                            'capacity': capacity,
-                            'total_quantity': capacity,
-                            'is_mixed': len(set(i['product_code'] for i in current_carton_items)) > 1,
-                            'product_type': product_type
-                        })
-                        current_carton_items = []
-                        current_carton_qty = 0
-
-            # Don't forget the last partial carton
-            if current_carton_items:
-                all_cartons.append({
-                    'items': current_carton_items,
-                    'capacity': capacity,
-                    'total_quantity': current_carton_qty,
-                    'is_mixed': len(set(i['product_code'] for i in current_carton_items)) > 1,
-                    'product_type': product_type
-                })
-
-    return all_cartons
+def iter_label_pairs(labels):
+    """Group labels two per sticker pass; the last right label may be None."""
+    labels = iter(labels)
+    for left in labels:
+        yield left, next(labels, None)
 
 
 def setup_styles():
@@ -313,10 +178,40 @@ class BarcodeApp:
         self.printer = TSCPrinter()
         self.current_label_image = None
         self.cart_items = []
+        # Cart rows keep a stable Treeview id; the view only applies changes
+        self._cart_ids = count(1)
+        self._cart_rows = {}
+        self._cart_type_totals = {}
+
+        # Printed history is written locally first and uploaded in the background
+        self.local_store = LocalStore()
+        db.set_snapshot_store(self.local_store)
+        # Printed labels are handed to a writer thread so printing never waits on a commit
+        self.history_writer = HistoryWriter(
+            lambda labels: self.local_store.record_history_ranges(db.build_history_ranges(labels)))
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        # Database calls from the UI run on a thread pool; callbacks come back on the Tk thread
+        self.adb = AsyncDatabase(self.root, error_handler=self._show_db_error)
+        self.history_generation = 0
 
         self._create_menu()
+        self._create_status_bar()
         self._create_ui()
-        self._refresh_all_data()
+
+        # Long-running actions (printing, exports) run as background tasks
+        self.tasks = TaskRunner(self.root, on_change=self._update_task_status,
+                                error_handler=self._show_task_error)
+        self.printing = False
+
+        # Warm start: paint the last saved snapshot until live data arrives
+        snapshot = self.local_store.load_reference_snapshot("startup")
+        if snapshot:
+            db.products_cache.seed(snapshot['products'])
+            db.locations_cache.seed(snapshot['locations'])
+            self._apply_snapshot(dict(snapshot, history_cursor=None))
+
+        # Show the window first, then connect and migrate in the background
+        self.root.after_idle(self._connect_database)
 
     def _create_menu(self):
         menubar = tk.Menu(self.root, bg=COLORS["card"], fg=COLORS["text"],
@@ -328,18 +223,147 @@ class BarcodeApp:
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Export History", command=self._export_history)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self._on_close)
 
         settings_menu = tk.Menu(menubar, tearoff=0, bg=COLORS["card"], fg=COLORS["text"],
                                activebackground=COLORS["primary"])
         menubar.add_cascade(label="Settings", menu=settings_menu)
         settings_menu.add_command(label="Printer Setup", command=self._show_printer_setup)
+        settings_menu.add_command(label="Database Diagnostics", command=self._show_diagnostics)
 
         help_menu = tk.Menu(menubar, tearoff=0, bg=COLORS["card"], fg=COLORS["text"],
                            activebackground=COLORS["primary"])
         menubar.add_cascade(label="Help", menu=help_menu)
         help_menu.add_command(label="About", command=self._show_about)
 
+    def _create_status_bar(self):
+        """Create bottom status bar with the database connection indicator"""
+        bar = tk.Frame(self.root, bg=COLORS["card"], padx=15, pady=4)
+        bar.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self.db_status_label = tk.Label(bar, text="", font=("Segoe UI", 9),
+                                        bg=COLORS["card"], fg=COLORS["text_dim"], cursor="hand2")
+        self.db_status_label.pack(side=tk.LEFT)
+        self.db_status_label.bind("<Button-1>", lambda e: self._connect_database())
+        self.db_connected = False
+        self.db_connecting = False
+
+        self.sync_status_label = tk.Label(bar, text="", font=("Segoe UI", 9),
+                                          bg=COLORS["card"], fg=COLORS["text_dim"])
+        self.sync_status_label.pack(side=tk.RIGHT)
+        self.history_synced_at = None
+        self.root.after(1000, self._update_sync_status)
+
+        # Background task progress (hidden while nothing is running)
+        self.task_frame = tk.Frame(bar, bg=COLORS["card"])
+        self.task_label = tk.Label(self.task_frame, text="", font=("Segoe UI", 9),
+                                   bg=COLORS["card"], fg=COLORS["text"])
+        self.task_label.pack(side=tk.LEFT)
+        self.task_progress = ttk.Progressbar(self.task_frame, length=160, mode="determinate")
+        self.task_progress.pack(side=tk.LEFT, padx=(10, 10))
+        tk.Button(self.task_frame, text="Cancel", font=("Segoe UI", 8), bg=COLORS["border"],
+                 fg=COLORS["text"], border=0, padx=8, cursor="hand2",
+                 command=self._cancel_task).pack(side=tk.LEFT)
+
+    def _update_task_status(self):
+        """Show the oldest running task with its progress"""
+        running = self.tasks.tasks
+        if not running:
+            if self.task_frame.winfo_ismapped():
+                self.task_frame.pack_forget()
+            return
+        if not self.task_frame.winfo_ismapped():
+            self.task_frame.pack(side=tk.LEFT, padx=(20, 0))
+
+        task = running[0]
+        text = task.title + (f" - {task.message}" if task.message else "")
+        if len(running) > 1:
+            text += f" (+{len(running) - 1} more)"
+        self.task_label.config(text=text)
+        if task.total:
+            self.task_progress.config(mode="determinate", value=100 * task.done / task.total)
+        else:
+            self.task_progress.config(mode="indeterminate")
+            self.task_progress.step(5)
+
+    def _cancel_task(self):
+        if self.tasks.tasks:
+            self.tasks.tasks[0].cancel()
+
+    def _show_task_error(self, task, error):
+        messagebox.showerror("Error", f"{task.title} failed:\n{error}")
+
+    def _update_sync_status(self):
+        """Show how many printed ranges are still waiting to be uploaded"""
+        pending = self.local_store.pending_count()
+        if self.history_writer.last_error:
+            text, color = f"History not saved yet: {self.history_writer.last_error}", COLORS["danger"]
+        elif pending == 0:
+            text, color = "All history synced", COLORS["text_dim"]
+        elif self.local_store.last_sync_error:
+            text, color = f"{pending} ranges waiting to sync (server unreachable)", COLORS["warning"]
+        else:
+            text, color = f"{pending} ranges syncing...", COLORS["warning"]
+        self.sync_status_label.config(text=text, fg=color)
+
+        # New ranges reached the server - show them in the history tab
+        synced_at = self.local_store.last_synced_at
+        if synced_at != self.history_synced_at:
+            self.history_synced_at = synced_at
+            if self.db_connected:
+                self._refresh_history()
+        self.root.after(2000, self._update_sync_status)
+
+    def _on_close(self):
+        """Flush pending history to the server before exiting"""
+        self.adb.shutdown()
+        self.tasks.cancel_all()
+        # A print pass in progress still queues its labels; let it finish first
+        self.tasks.wait_all(timeout=15)
+        self.history_writer.close()
+        self.local_store.stop(db.sync_history_ranges)
+        db.close_pool()
+        self.root.quit()
+
+    def _set_db_status(self, state, detail=""):
+        """Update the connection indicator (connecting, connected or offline)"""
+        host = DATABASE_CONFIG["host"]
+        if state == "connecting":
+            text, color = f"\u25cf Connecting to {host}...", COLORS["warning"]
+        elif state == "connected":
+            text, color = f"\u25cf Connected to {host}", COLORS["primary"]
+        else:
+            text, color = f"\u25cf Database offline - click to retry ({detail})", COLORS["danger"]
+        self.db_status_label.config(text=text, fg=color)
+
+    def _connect_database(self):
+        """Connect and bring the schema up to date on a background thread"""
+        if self.db_connecting:
+            return
+        self.db_connecting = True
+        self._set_db_status("connecting")
+        self.adb.ensure_schema(callback=lambda version: self._on_database_connected(None),
+                               errback=self._on_database_connected)
+
+    def _on_database_connected(self, error):
+        self.db_connecting = False
+        # Start uploading once migrations have had their chance to run
+        self.local_store.start(db.sync_history_ranges)
+        if error is None:
+            self.db_connected = True
+            self._set_db_status("connected")
+            self._refresh_all_data()
+        else:
+            self.db_connected = False
+            self._set_db_status("offline", error)
+            # Products and locations fall back to the local snapshot
+            self._refresh_products()
+            self._refresh_locations()
+
+    def _show_db_error(self, error):
+        """Default handler for failed background database calls"""
+        messagebox.showerror("Database Error", str(error))
+
     def _create_ui(self):
         # Main container
         main = ttk.Frame(self.root)
@@ -467,7 +491,7 @@ class BarcodeApp:
         self.serial_start_entry.pack(side=tk.LEFT, padx=(10, 0), ipady=5, ipadx=5)
 
         # Serial preview
-        self.serial_preview_label = tk.Label(serial_frame, text="Serials: 0001 - 0001",
+        self.serial_preview_label = tk.Label(serial_frame, text="Serials: next free block",
                                              font=("Segoe UI", 9), bg=COLORS["card"], fg=COLORS["text_dim"])
         self.serial_preview_label.pack(anchor=tk.W, pady=(5, 0))
 
@@ -495,7 +519,11 @@ class BarcodeApp:
         """Update serial range preview"""
         try:
             qty = int(self.quantity_var.get())
-            start = int(self.serial_start_var.get()) if self.custom_serial_var.get() else 1
+            if not self.custom_serial_var.get():
+                # Reserved from the shared counter when the item is added
+                self.serial_preview_label.config(text=f"Serials: next free block of {qty}")
+                return
+            start = int(self.serial_start_var.get())
             end = start + qty - 1
             self.serial_preview_label.config(text=f"Serials: {start:04d} - {end:04d}")
         except ValueError:
@@ -544,6 +572,10 @@ class BarcodeApp:
                                         font=("Segoe UI", 11, "bold"), bg=COLORS["card"], fg=COLORS["accent"])
         self.cart_info_label.pack(side=tk.LEFT)
 
+        self.cart_summary_label = tk.Label(info_frame, text="Empty", font=("Segoe UI", 10),
+                                           bg=COLORS["card"], fg=COLORS["text_dim"])
+        self.cart_summary_label.pack(side=tk.RIGHT)
+
         # Cart list
         list_frame = tk.Frame(tab, bg=COLORS["bg"])
         list_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
@@ -691,25 +723,59 @@ class BarcodeApp:
                                    bg=COLORS["card"], fg=COLORS["text_dim"])
         self.stats_label.pack(anchor=tk.W, pady=(5, 0))
 
+        # Barcode prefix search
+        search_frame = tk.Frame(tab, bg=COLORS["bg"])
+        search_frame.pack(fill=tk.X, padx=15, pady=(0, 10))
+
+        tk.Label(search_frame, text="Barcode starts with:",
+                bg=COLORS["bg"], fg=COLORS["text_dim"]).pack(side=tk.LEFT)
+
+        self.history_search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=self.history_search_var,
+                                bg=COLORS["input_bg"], fg=COLORS["text"],
+                                insertbackground=COLORS["text"], border=0, width=30)
+        search_entry.pack(side=tk.LEFT, padx=(10, 10), ipady=5, ipadx=5)
+        search_entry.bind("<Return>", lambda e: self._refresh_history())
+
+        tk.Button(search_frame, text="Search", bg=COLORS["border"], fg=COLORS["text"],
+                 border=0, padx=15, pady=4, cursor="hand2",
+                 command=self._refresh_history).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(search_frame, text="Clear", bg=COLORS["border"], fg=COLORS["text"],
+                 border=0, padx=15, pady=4, cursor="hand2",
+                 command=self._clear_history_search).pack(side=tk.LEFT)
+
         # List
         list_frame = tk.Frame(tab, bg=COLORS["bg"])
         list_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
 
+        # Only the rows in view exist as Treeview items; the next page is
+        # fetched as the view nears the end of what has been loaded
         columns = ("barcode", "product", "location", "delivery", "qty", "created")
-        self.history_tree = ttk.Treeview(list_frame, columns=columns, show="headings")
+        self.history_view = VirtualTreeview(list_frame, columns, on_near_end=self._load_more_history)
+        self.history_tree = self.history_view.tree
 
         for col, width in [("barcode", 220), ("product", 150), ("location", 100), ("delivery", 80), ("qty", 50), ("created", 140)]:
             self.history_tree.heading(col, text=col.title())
             self.history_tree.column(col, width=width)
 
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.history_tree.yview)
-        self.history_tree.configure(yscrollcommand=scrollbar.set)
+        btn_frame = tk.Frame(tab, bg=COLORS["bg"])
+        btn_frame.pack(pady=(0, 15))
 
-        self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tk.Button(btn_frame, text="Refresh", bg=COLORS["border"], fg=COLORS["text"],
+                 border=0, padx=15, pady=8, cursor="hand2", command=self._refresh_history).pack(side=tk.LEFT, padx=(0, 10))
 
-        tk.Button(tab, text="Refresh", bg=COLORS["border"], fg=COLORS["text"],
-                 border=0, padx=15, pady=8, cursor="hand2", command=self._refresh_history).pack(pady=(0, 15))
+        self.history_more_btn = tk.Button(btn_frame, text="Load More", bg=COLORS["border"], fg=COLORS["text"],
+                                          border=0, padx=15, pady=8, cursor="hand2",
+                                          command=self._load_more_history)
+        self.history_more_btn.pack(side=tk.LEFT)
+
+        self.history_count_label = tk.Label(btn_frame, text="", font=("Segoe UI", 9),
+                                            bg=COLORS["bg"], fg=COLORS["text_dim"])
+        self.history_count_label.pack(side=tk.LEFT, padx=(10, 0))
+
+        # Keyset cursor for the next history page (None when fully loaded)
+        self.history_cursor = None
+        self.history_loading = False
 
     # ==================== CART FUNCTIONS ====================
 
@@ -728,29 +794,41 @@ class BarcodeApp:
         product = self._get_selected_product()
         location = self._get_selected_location()
         delivery_code = self.delivery_var.get()
+        if product is None or location is None:
+            messagebox.showwarning("Warning", "Products and destinations are still loading, please try again")
+            return
 
         try:
             qty = int(self.quantity_var.get())
-            start_serial = int(self.serial_start_var.get()) if self.custom_serial_var.get() else 1
+            custom_start = int(self.serial_start_var.get()) if self.custom_serial_var.get() else None
         except ValueError:
             messagebox.showwarning("Warning", "Invalid quantity or serial number")
             return
 
-        end_serial = start_serial + qty - 1
-
-        # Generate barcode preview
-        barcode_preview = f"{location['code']}-{product['code']}-{start_serial:04d}"
+        def add_item(start_serial):
+            self.cart_items.append({
+                "id": str(next(self._cart_ids)),
+                "product": product,
+                "location": location,
+                "delivery_code": delivery_code,
+                "quantity": qty,
+                "start_serial": start_serial,
+                "end_serial": start_serial + qty - 1
+            })
+            self._refresh_cart()
 
-        item = {
-            "product": product,
-            "location": location,
-            "delivery_code": delivery_code,
-            "quantity": qty,
-            "start_serial": start_serial,
-            "end_serial": end_serial
-        }
-        self.cart_items.append(item)
-        self._refresh_cart()
+        if custom_start is None:
+            # Shared counter keeps serials unique across packing stations
+            self.adb.reserve_serials(
+                location['id'], product['id'], qty, callback=add_item,
+                errback=lambda e: messagebox.showerror(
+                    "Error", f"Could not reserve serials:\n{e}\n\n"
+                             "Use a custom starting serial while the database is offline."))
+        else:
+            add_item(custom_start)
+            # Offline the manual block is still printed, the counter is just not advanced
+            self.adb.claim_serials(location['id'], product['id'], custom_start + qty - 1,
+                                   errback=lambda e: None)
 
         # Reset quantity and serial
         self.quantity_var.set("1")
@@ -759,36 +837,79 @@ class BarcodeApp:
         self._toggle_custom_serial()
 
     def _refresh_cart(self):
-        """Refresh cart display"""
-        self.cart_tree.delete(*self.cart_tree.get_children())
+        """Bring the cart view in line with cart_items.
 
+        Rows are keyed by the item's id and the values last shown are kept in
+        _cart_rows, so only added, changed or removed items touch the
+        Treeview, and the per-type totals are adjusted by the same deltas.
+        """
         delivery_code = self.delivery_var.get()
         location = self.location_var.get()
         loc_code = location.split(" - ")[0] if location and " - " in location else "--"
 
         self.cart_info_label.config(text=f"Delivery: {delivery_code} | Destination: {loc_code}")
 
-        for i, item in enumerate(self.cart_items):
-            serial_range = f"{item['start_serial']:04d} - {item['end_serial']:04d}"
-            barcode_preview = f"{item['location']['code']}-{item['product']['code']}-{item['start_serial']:04d}"
+        current = {item['id'] for item in self.cart_items}
+        removed = [item_id for item_id in self._cart_rows if item_id not in current]
+        if removed:
+            self.cart_tree.delete(*removed)
+            for item_id in removed:
+                self._count_cart_row(self._cart_rows.pop(item_id), -1)
+
+        for index, item in enumerate(self.cart_items):
+            row = self._cart_row(item)
+            shown = self._cart_rows.get(item['id'])
+            if shown == row:
+                continue
+            if shown is None:
+                self.cart_tree.insert("", index, iid=item['id'], values=row[0])
+            else:
+                self.cart_tree.item(item['id'], values=row[0])
+                self._count_cart_row(shown, -1)
+            self._cart_rows[item['id']] = row
+            self._count_cart_row(row, 1)
+
+        self._update_cart_summary()
+
+    @staticmethod
+    def _cart_row(item):
+        """(values, product type, quantity) shown for a cart item"""
+        values = (
+            f"{item['product']['code']} - {item['product']['name']}",
+            f"{item['start_serial']:04d} - {item['end_serial']:04d}",
+            item['quantity'],
+            f"{item['location']['code']}-{item['product']['code']}-{item['start_serial']:04d}"
+        )
+        return values, get_product_type(item['product']['code']), item['quantity']
+
+    def _count_cart_row(self, row, sign):
+        _, product_type, quantity = row
+        total = self._cart_type_totals.get(product_type, 0) + sign * quantity
+        if total:
+            self._cart_type_totals[product_type] = total
+        else:
+            self._cart_type_totals.pop(product_type, None)
 
-            self.cart_tree.insert("", tk.END, values=(
-                f"{item['product']['code']} - {item['product']['name']}",
-                serial_range,
-                item['quantity'],
-                barcode_preview
-            ), tags=(str(i),))
+    def _update_cart_summary(self):
+        """Labels and cartons in the cart; remainders of one type share cartons"""
+        if not self._cart_type_totals:
+            self.cart_summary_label.config(text="Empty")
+            return
+        cartons = {product_type: -(-total // get_carton_capacity(product_type))
+                   for product_type, total in self._cart_type_totals.items()}
+        per_type = ", ".join(f"{product_type} {n}" for product_type, n in sorted(cartons.items()))
+        self.cart_summary_label.config(
+            text=f"{len(self._cart_rows)} lines | {sum(self._cart_type_totals.values())} labels | "
+                 f"{sum(cartons.values())} cartons ({per_type})")
 
     def _remove_from_cart(self):
         """Remove selected item from cart"""
-        selection = self.cart_tree.selection()
+        selection = set(self.cart_tree.selection())
         if not selection:
             messagebox.showwarning("Warning", "Please select an item to remove")
             return
 
-        indices = [int(self.cart_tree.item(s)['tags'][0]) for s in selection]
-        for i in sorted(indices, reverse=True):
-            del self.cart_items[i]
+        self.cart_items = [item for item in self.cart_items if item['id'] not in selection]
         self._refresh_cart()
 
     def _clear_cart(self):
@@ -814,10 +935,13 @@ class BarcodeApp:
         )
 
         if filename:
-            self._generate_pdf(filename)
-            messagebox.showinfo("Success", f"Cart exported to PDF:\n{filename}")
+            items = list(self.cart_items)
+            delivery_code = self.delivery_var.get()
+            location = self._get_selected_location()
+            self.tasks.run("Exporting cart PDF", self._generate_pdf, filename, items, delivery_code, location,
+                           on_done=lambda _: messagebox.showinfo("Success", f"Cart exported to PDF:\n{filename}"))
 
-    def _generate_pdf(self, filename):
+    def _generate_pdf(self, task, filename, cart_items, delivery_code, location):
         """Generate PDF from cart items - organized by cartons for packing.
 
         Each carton gets its own page showing:
@@ -840,8 +964,6 @@ class BarcodeApp:
         styles = getSampleStyleSheet()
 
         # Get delivery info
-        delivery_code = self.delivery_var.get()
-        location = self._get_selected_location()
         loc_name = location['name'] if location else "--"
         loc_code = location['code'] if location else "--"
 
@@ -909,8 +1031,8 @@ class BarcodeApp:
             textColor=colors.HexColor('#000000')
         )
 
-        # Use smart packing to fill cartons efficiently and mix remainders
-        cartons = pack_cartons_smart(self.cart_items)
+        # Fill cartons efficiently, keeping mixed cartons and split ranges to a minimum
+        cartons = pack_cartons(cart_items)
         total_cartons = len(cartons)
 
         # Style for mixed carton indicator
@@ -928,6 +1050,8 @@ class BarcodeApp:
         for i, carton in enumerate(cartons):
             carton_number = i + 1
             carton_label = f"{delivery_code}/{carton_number}"
+            # Raises TaskCancelled once Cancel is pressed; nothing is written before doc.build
+            task.progress(i, total_cartons, f"Carton {carton_number} of {total_cartons}")
 
             # Large carton label at top
             elements.append(Spacer(1, 50))
@@ -1001,10 +1125,13 @@ class BarcodeApp:
         )
 
         if filename:
-            self._generate_delivery_note_pdf(filename)
-            messagebox.showinfo("Success", f"Delivery note exported to PDF:\n{filename}")
+            items = list(self.cart_items)
+            location = self._get_selected_location()
+            self.tasks.run("Exporting delivery note", self._generate_delivery_note_pdf,
+                           filename, items, delivery_code, location,
+                           on_done=lambda _: messagebox.showinfo("Success", f"Delivery note exported to PDF:\n{filename}"))
 
-    def _generate_delivery_note_pdf(self, filename):
+    def _generate_delivery_note_pdf(self, task, filename, cart_items, delivery_code, location):
         """Generate a complete delivery note PDF with all details.
 
         Shows complete summary of the delivery including:
@@ -1021,8 +1148,6 @@ class BarcodeApp:
         styles = getSampleStyleSheet()
 
         # Get delivery info
-        delivery_code = self.delivery_var.get()
-        location = self._get_selected_location()
         loc_name = location['name'] if location else "--"
         loc_code = location['code'] if location else "--"
 
@@ -1083,14 +1208,14 @@ class BarcodeApp:
 
         elements.append(Spacer(1, 30))
 
-        # Use smart packing to calculate cartons with mixing
-        cartons = pack_cartons_smart(self.cart_items)
-        total_items = sum(item['quantity'] for item in self.cart_items)
+        # Pack remainders to minimise cartons, then mixed cartons
+        cartons = pack_cartons(cart_items)
+        total_items = sum(item['quantity'] for item in cart_items)
         total_cartons = len(cartons)
 
         # Build product summary for the product details table
         product_summary = []
-        for item in self.cart_items:
+        for item in cart_items:
             product_code = item['product']['code']
             product_name = item['product']['name']
             qty = item['quantity']
@@ -1107,7 +1232,7 @@ class BarcodeApp:
             })
 
         # Count mixed cartons
-        mixed_cartons = sum(1 for c in cartons if c['is_mixed'])
+        mixed_cartons = cartons.mixed_count
 
         # Summary Table
         elements.append(Paragraph("Summary", section_style))
@@ -1169,10 +1294,18 @@ class BarcodeApp:
 
         carton_data = [['Carton', 'Product(s)', 'Quantity', 'Serial Range(s)']]
 
-        for carton_idx, carton in enumerate(cartons):
-            carton_label = f"{delivery_code}/{carton_idx + 1}"
+        # A run of identical full cartons is listed as one row
+        for carton_number, run_length, carton, last in cartons.runs():
+            carton_label = f"{delivery_code}/{carton_number}"
+            task.progress(carton_number - 1, total_cartons, f"Carton {carton_number} of {total_cartons}")
 
-            if carton['is_mixed']:
+            if run_length > 1:
+                item = carton['items'][0]
+                carton_label += f"\nto {delivery_code}/{carton_number + run_length - 1}"
+                products_str = item['product_code']
+                qty_str = f"{run_length} x {item['quantity']}"
+                serial_str = f"{item['start_serial']:04d} - {last['items'][0]['end_serial']:04d}"
+            elif carton['is_mixed']:
                 # Mixed carton - show all products
                 products_str = "MIXED:\n" + "\n".join(
                     f"{item['product_code']}" for item in carton['items']
@@ -1236,94 +1369,121 @@ class BarcodeApp:
             messagebox.showwarning("Warning", "Please select a delivery code")
             return
 
-        delivery_code = self.delivery_var.get()
+        if self.printing:
+            messagebox.showwarning("Warning", "The cart is already being printed")
+            return
+
+        self.printing = True
+        items = list(self.cart_items)
+        self.tasks.run("Printing cart", self._print_cart_task, items, self.delivery_var.get(),
+                       on_done=lambda result: self._on_cart_printed(items, result),
+                       on_error=lambda error: self._on_cart_print_failed(error))
+
+    def _print_cart_task(self, task, items, delivery_code):
+        """Worker side of _print_all_cart; stops between passes when cancelled"""
         success_count = 0
         fail_count = 0
+        attempted = 0
+        total = sum(item['quantity'] for item in items)
 
-        # Collect all barcodes to print
-        all_barcodes = []
-        for item in self.cart_items:
-            for serial in range(item['start_serial'], item['end_serial'] + 1):
-                barcode_data = f"{item['location']['code']}-{item['product']['code']}-{serial:04d}"
-                all_barcodes.append({
-                    'barcode': barcode_data,
-                    'product_name': item['product']['name'],
-                    'location_name': item['location']['name'],
-                    'product_id': item['product']['id'],
-                    'location_id': item['location']['id']
-                })
-
-        # Print in pairs (2 different stickers per pass)
-        i = 0
-        while i < len(all_barcodes):
-            left_item = all_barcodes[i]
-            right_item = all_barcodes[i + 1] if i + 1 < len(all_barcodes) else None
+        # Print in pairs (2 different stickers per pass); labels are generated as they are printed
+        for left, right in iter_label_pairs(iter_cart_labels(items)):
+            try:
+                task.progress(attempted, total, f"{attempted} of {total} labels")
+            except TaskCancelled:
+                break
+
+            pair = [left] if right is None else [left, right]
+            left_item, _, left_barcode = left
 
             # Print label with 2 different barcodes (or just 1 if odd number)
             success, _ = self.printer.print_label(
-                left_item['barcode'],
-                left_item['product_name'],
-                left_item['location_name'],
+                left_barcode,
+                left_item['product']['name'],
+                left_item['location']['name'],
                 delivery_code,
                 False,  # Code128
                 1,
-                right_item['barcode'] if right_item else None
+                right[2] if right else None
             )
+            attempted += len(pair)
 
             if success:
-                # Save left barcode to history
-                db.save_barcode_history(
-                    left_item['barcode'],
-                    left_item['product_id'],
-                    left_item['location_id'],
-                    delivery_code,
-                    1
-                )
-                success_count += 1
-
-                # Save right barcode to history if exists
-                if right_item:
-                    db.save_barcode_history(
-                        right_item['barcode'],
-                        right_item['product_id'],
-                        right_item['location_id'],
+                # Queue printed barcodes for history
+                for item, serial, barcode_data in pair:
+                    self.history_writer.put((
+                        barcode_data,
+                        item['product']['id'],
+                        item['location']['id'],
                         delivery_code,
-                        1
-                    )
-                    success_count += 1
+                        serial
+                    ))
+                success_count += len(pair)
             else:
-                fail_count += 1
-                if right_item:
-                    fail_count += 1
-
-            # Move to next pair
-            i += 2
-
-        # Clear cart and refresh
-        self.cart_items = []
+                fail_count += len(pair)
+
+        # Upload the run now rather than at the next sync interval
+        self.history_writer.flush()
+        self.local_store.sync_soon()
+
+        return {"printed": success_count, "failed": fail_count,
+                "attempted": attempted, "cancelled": task.cancelled}
+
+    def _on_cart_printed(self, items, result):
+        self.printing = False
+
+        # Drop what was sent to the printer; a cancelled run keeps the rest
+        # unless it was removed from the cart meanwhile. Items added to the
+        # cart while printing stay untouched.
+        in_cart = {item['id'] for item in self.cart_items}
+        remaining = [item for item in self._unprinted_items(items, result['attempted'])
+                     if item['id'] in in_cart]
+        self.cart_items = remaining + [item for item in self.cart_items
+                                       if not any(item is printed for printed in items)]
         self._refresh_cart()
-        self._refresh_history()
 
-        if fail_count == 0:
-            messagebox.showinfo("Success", f"Printed {success_count} labels")
+        if result['cancelled']:
+            messagebox.showinfo("Cancelled", f"Printing cancelled after {result['printed']} labels; "
+                                             f"the unprinted serials are still in the cart")
+        elif result['failed'] == 0:
+            messagebox.showinfo("Success", f"Printed {result['printed']} labels")
         else:
-            messagebox.showwarning("Partial Success", f"Printed {success_count} labels, {fail_count} failed")
+            messagebox.showwarning("Partial Success",
+                                   f"Printed {result['printed']} labels, {result['failed']} failed")
+
+    def _on_cart_print_failed(self, error):
+        self.printing = False
+        messagebox.showerror("Error", f"Printing stopped:\n{error}")
+
+    @staticmethod
+    def _unprinted_items(items, attempted):
+        """Cart items left after the first attempted labels were sent, in order"""
+        remaining = []
+        for item in items:
+            if attempted >= item['quantity']:
+                attempted -= item['quantity']
+                continue
+            if attempted:
+                item = dict(item, start_serial=item['start_serial'] + attempted,
+                            quantity=item['quantity'] - attempted)
+                attempted = 0
+            remaining.append(item)
+        return remaining
 
     # ==================== HELPER FUNCTIONS ====================
 
     def _get_selected_product(self):
         code = self.product_var.get().split(" - ")[0]
-        for p in db.get_all_products():
-            if p['code'] == code:
-                return dict(p)
-        return None
+        # Only the in-memory copy is read here; the version check runs on the pool
+        product = db.products_cache.cached_by_code(code)
+        self.adb.submit(db.products_cache.refresh, errback=lambda e: None)
+        return dict(product) if product else None
 
     def _get_selected_location(self):
         code = self.location_var.get().split(" - ")[0]
-        for l in db.get_all_locations():
-            if l['code'] == code:
-                return dict(l)
-        return None
+        location = db.locations_cache.cached_by_code(code)
+        self.adb.submit(db.locations_cache.refresh, errback=lambda e: None)
+        return dict(location) if location else None
 
     # ==================== CRUD FUNCTIONS ====================
 
@@ -1336,14 +1496,14 @@ class BarcodeApp:
             messagebox.showwarning("Warning", "Code and Name required")
             return
 
-        try:
-            db.add_product(code, name, desc)
+        def added(product_id):
             self._refresh_products()
             self.new_product_code.delete(0, tk.END)
             self.new_product_name.delete(0, tk.END)
             self.new_product_desc.delete(0, tk.END)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.adb.add_product(code, name, desc, callback=added,
+                             errback=lambda e: messagebox.showerror("Error", str(e)))
 
     def _delete_product(self):
         selection = self.products_tree.selection()
@@ -1351,11 +1511,9 @@ class BarcodeApp:
             return
         if messagebox.askyesno("Confirm", "Delete product?"):
             code = self.products_tree.item(selection[0])['values'][0]
-            for p in db.get_all_products():
-                if p['code'] == code:
-                    db.delete_product(p['id'])
-                    break
-            self._refresh_products()
+            product = db.products_cache.cached_by_code(code)
+            if product:
+                self.adb.delete_product(product['id'], callback=lambda _: self._refresh_products())
 
     def _add_location(self):
         code = self.new_location_code.get().strip()
@@ -1366,14 +1524,14 @@ class BarcodeApp:
             messagebox.showwarning("Warning", "Code and Name required")
             return
 
-        try:
-            db.add_location(code, name, addr)
+        def added(location_id):
             self._refresh_locations()
             self.new_location_code.delete(0, tk.END)
             self.new_location_name.delete(0, tk.END)
             self.new_location_addr.delete(0, tk.END)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.adb.add_location(code, name, addr, callback=added,
+                              errback=lambda e: messagebox.showerror("Error", str(e)))
 
     def _delete_location(self):
         selection = self.locations_tree.selection()
@@ -1381,73 +1539,138 @@ class BarcodeApp:
             return
         if messagebox.askyesno("Confirm", "Delete location?"):
             code = self.locations_tree.item(selection[0])['values'][0]
-            for l in db.get_all_locations():
-                if l['code'] == code:
-                    db.delete_location(l['id'])
-                    break
-            self._refresh_locations()
+            location = db.locations_cache.cached_by_code(code)
+            if location:
+                self.adb.delete_location(location['id'], callback=lambda _: self._refresh_locations())
 
     # ==================== REFRESH FUNCTIONS ====================
 
-    def _refresh_combos(self):
-        products = db.get_all_products()
-        self.product_combo['values'] = [f"{p['code']} - {p['name']}" for p in products]
-
-        locations = db.get_all_locations()
-        self.location_combo['values'] = [f"{l['code']} - {l['name']}" for l in locations]
-
     def _refresh_products(self):
+        self.adb.submit(db.products_cache.all, callback=self._show_products)
+
+    def _show_products(self, products):
         self.products_tree.delete(*self.products_tree.get_children())
-        for p in db.get_all_products():
+        for p in products:
             self.products_tree.insert("", tk.END, values=(
                 p['code'], p['name'], p['description'] or "", p['created_at']
             ))
-        self._refresh_combos()
+        self.product_combo['values'] = [f"{p['code']} - {p['name']}" for p in products]
 
     def _refresh_locations(self):
+        self.adb.submit(db.locations_cache.all, callback=self._show_locations)
+
+    def _show_locations(self, locations):
         self.locations_tree.delete(*self.locations_tree.get_children())
-        for l in db.get_all_locations():
+        for l in locations:
             self.locations_tree.insert("", tk.END, values=(
                 l['code'], l['name'], l['address'] or "", l['created_at']
             ))
-        self._refresh_combos()
+        self.location_combo['values'] = [f"{l['code']} - {l['name']}" for l in locations]
 
     def _refresh_history(self):
-        stats = db.get_location_stats()
+        self.adb.get_location_stats(callback=self._show_history_stats)
+
+        # Pages still in flight for the previous listing are ignored
+        self.history_generation += 1
+        self.history_cursor = None
+        self.history_view.clear()
+        self._load_history_page(None)
+
+    def _show_history_stats(self, stats):
         if stats:
             text = " | ".join([f"{s['location_name']}: {int(s['total_items'])} items" for s in stats])
         else:
             text = "No labels printed today"
         self.stats_label.config(text=text)
 
-        self.history_tree.delete(*self.history_tree.get_children())
-        for h in db.get_barcode_history():
+    def _clear_history_search(self):
+        self.history_search_var.set("")
+        self._refresh_history()
+
+    def _load_more_history(self):
+        """Append the next page of history below the rows already shown"""
+        if self.history_cursor is not None and not self.history_loading:
+            self._load_history_page(self.history_cursor)
+
+    def _load_history_page(self, before):
+        self.history_loading = True
+        generation = self.history_generation
+        prefix = self.history_search_var.get().strip().upper() or None
+
+        def loaded(page):
+            if generation == self.history_generation:
+                self.history_loading = False
+                self._show_history_page(*page)
+
+        def failed(error):
+            if generation == self.history_generation:
+                self.history_loading = False
+                self._show_db_error(error)
+
+        self.adb.get_barcode_history_page(before=before, prefix=prefix, row_format="record",
+                                          callback=loaded, errback=failed)
+
+    def _show_history_page(self, rows, next_cursor):
+        self.history_cursor = next_cursor
+        values = []
+        for h in rows:
             # delivery_code is stored in packer_name field for now
-            delivery = h.get('packer_name') or h.get('delivery_code') or "-"
-            self.history_tree.insert("", tk.END, values=(
-                h['barcode_data'], h['product_name'] or "-", h['location_name'] or "-",
+            delivery = h.get('packer_name') or h['delivery_code'] or "-"
+            barcode = h['barcode_data']
+            if h['end_serial'] is not None and h['end_serial'] != h['start_serial']:
+                barcode = f"{barcode} .. {h['end_serial']:04d}"
+            values.append((
+                barcode, h['product_name'] or "-", h['location_name'] or "-",
                 delivery, h['quantity'], h['created_at']
             ))
+        self.history_view.append_rows(values)
+
+        shown = len(self.history_view)
+        more = self.history_cursor is not None
+        self.history_more_btn.config(state=tk.NORMAL if more else tk.DISABLED)
+        self.history_count_label.config(text=f"Showing {shown} entries" + ("" if more else " (all)"))
 
     def _refresh_all_data(self):
-        self._refresh_products()
-        self._refresh_locations()
-        self._refresh_history()
+        """Populate every tab from one database snapshot"""
+        def load():
+            snapshot = db.load_snapshot()
+            # Saved locally so the next start can paint before connecting
+            self.local_store.save_reference_snapshot("startup", snapshot)
+            return snapshot
+
+        self.adb.submit(load, callback=self._apply_snapshot)
+
+    def _apply_snapshot(self, snapshot):
+        self._show_products(snapshot['products'])
+        self._show_locations(snapshot['locations'])
+        self._show_history_stats(snapshot['location_stats'])
+
+        self.history_generation += 1
+        self.history_loading = False
+        self.history_cursor = None
+        self.history_view.clear()
+        self._show_history_page(snapshot['history'], snapshot['history_cursor'])
 
     # ==================== DIALOGS ====================
 
     def _export_history(self):
         filename = filedialog.asksaveasfilename(defaultextension=".csv",
-                                                filetypes=[("CSV", "*.csv")])
+                                                filetypes=[("CSV", "*.csv"),
+                                                           ("NDJSON (gzip)", "*.ndjson.gz")])
         if filename:
-            history = db.get_barcode_history(limit=10000)
-            with open(filename, 'w') as f:
-                f.write("Barcode,Product,Location,Delivery,Qty,Created\n")
-                for h in history:
-                    delivery = h.get('packer_name') or h.get('delivery_code') or "-"
-                    f.write(f"{h['barcode_data']},{h['product_name']},{h['location_name']},"
-                           f"{delivery},{h['quantity']},{h['created_at']}\n")
-            messagebox.showinfo("Success", f"Exported to {filename}")
+            def failed(error):
+                # Don't leave a truncated file behind
+                if os.path.exists(filename):
+                    os.remove(filename)
+                if not isinstance(error, TaskCancelled):
+                    messagebox.showerror("Error", f"Export failed:\n{error}")
+
+            self.tasks.run(
+                "Exporting history",
+                lambda task: db.export_history(
+                    filename, progress=lambda n: task.progress(n, None, f"{n} labels")),
+                on_done=lambda count: messagebox.showinfo("Success", f"Exported {count} labels to {filename}"),
+                on_error=failed)
 
     def _show_printer_setup(self):
         dialog = tk.Toplevel(self.root)
@@ -1477,6 +1700,60 @@ class BarcodeApp:
         tk.Button(frame, text="Close", bg=COLORS["border"], fg=COLORS["text"],
                  border=0, padx=20, pady=8, command=dialog.destroy).pack(pady=30)
 
+    def _show_diagnostics(self):
+        """Show per-function database latency percentiles and sync backlog"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Database Diagnostics")
+        dialog.geometry("820x480")
+        dialog.configure(bg=COLORS["bg"])
+        dialog.transient(self.root)
+
+        frame = tk.Frame(dialog, bg=COLORS["bg"], padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        tk.Label(frame, text="Database Diagnostics", font=("Segoe UI", 16, "bold"),
+                bg=COLORS["bg"], fg=COLORS["text"]).pack(anchor=tk.W)
+
+        summary_label = tk.Label(frame, text="", bg=COLORS["bg"], fg=COLORS["text_dim"])
+        summary_label.pack(anchor=tk.W, pady=(5, 10))
+
+        columns = ("name", "calls", "p50", "p95", "p99", "max", "acquire", "rows")
+        tree = ttk.Treeview(frame, columns=columns, show="headings")
+        for col, title, width in [("name", "Function", 200), ("calls", "Calls", 60),
+                                  ("p50", "p50 ms", 70), ("p95", "p95 ms", 70),
+                                  ("p99", "p99 ms", 70), ("max", "Max ms", 70),
+                                  ("acquire", "Connect p50 ms", 100), ("rows", "Avg rows", 70)]:
+            tree.heading(col, text=title)
+            tree.column(col, width=width, anchor=tk.W if col == "name" else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            for s in db.query_stats():
+                tree.insert("", tk.END, values=(
+                    s['name'], s['calls'], f"{s['p50_ms']:.1f}", f"{s['p95_ms']:.1f}",
+                    f"{s['p99_ms']:.1f}", f"{s['max_ms']:.1f}",
+                    f"{s['acquire_p50_ms']:.1f}", f"{s['avg_rows']:.0f}"
+                ))
+            summary_label.config(
+                text=f"History queued in memory: {self.history_writer.pending()} | "
+                     f"Ranges waiting to sync: {self.local_store.pending_count()}")
+
+        def reset():
+            db.reset_query_stats()
+            refresh()
+
+        btn_frame = tk.Frame(frame, bg=COLORS["bg"])
+        btn_frame.pack(pady=(10, 0))
+        tk.Button(btn_frame, text="Refresh", bg=COLORS["border"], fg=COLORS["text"],
+                 border=0, padx=15, pady=8, command=refresh).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(btn_frame, text="Reset", bg=COLORS["border"], fg=COLORS["text"],
+                 border=0, padx=15, pady=8, command=reset).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(btn_frame, text="Close", bg=COLORS["border"], fg=COLORS["text"],
+                 border=0, padx=15, pady=8, command=dialog.destroy).pack(side=tk.LEFT)
+
+        refresh()
+
     def _show_about(self):
         messagebox.showinfo("About",
             "Barcode Generator v3.0\n\n"
@@ -0,0 +1,83 @@
+"""
+Benchmark the carton packers on typical delivery mixes
+Compares pack_cartons_smart (next-fit remainders) with the pack_cartons
+solver on randomly generated carts and reports cartons, mixed cartons,
+serial ranges listed on the carton sheets and planning time
+
+Usage: python benchmark_packing.py [--carts N] [--seed S] [--budget SECONDS]
+"""
+
+import argparse
+import random
+import time
+
+from config import PACKING_TIME_BUDGET
+from packing import pack_cartons, pack_cartons_smart
+
+PRODUCTS = ["WALT BLCK", "WALT BRWN", "WALT TAN", "4PCS BLCK", "4PCS BRWN", "4PCS TAN", "LAPB NVYB"]
+LOCATIONS = ["ISB", "RWP", "KAR", "LHR", "MUL"]
+
+
+def make_cart(rng, lines, products, locations, min_qty, max_qty):
+    """Random cart of lines with consecutive serials per product/location"""
+    next_serial = {}
+    cart = []
+    for _ in range(lines):
+        code = rng.choice(products)
+        location = rng.choice(locations)
+        qty = rng.randint(min_qty, max_qty)
+        start = next_serial.get((code, location), 1)
+        next_serial[(code, location)] = start + qty
+        cart.append({
+            "product": {"code": code, "name": code},
+            "location": {"code": location},
+            "quantity": qty,
+            "start_serial": start,
+            "end_serial": start + qty - 1,
+        })
+    return cart
+
+
+MIXES = {
+    "wallet colours": lambda rng: make_cart(rng, 3, PRODUCTS[:3], LOCATIONS[:1], 50, 600),
+    "full range": lambda rng: make_cart(rng, 7, PRODUCTS, LOCATIONS[:1], 10, 400),
+    "many small lines": lambda rng: make_cart(rng, 30, PRODUCTS, LOCATIONS[:1], 1, 60),
+    "multi-destination": lambda rng: make_cart(rng, 20, PRODUCTS, LOCATIONS, 20, 300),
+    "bulk order": lambda rng: make_cart(rng, 2, PRODUCTS[:2], LOCATIONS[:1], 50000, 150000),
+}
+
+
+def measure(packer, carts):
+    """(cartons, mixed cartons, serial ranges, ms per cart) summed over carts"""
+    cartons = mixed = ranges = 0
+    started = time.perf_counter()
+    for cart in carts:
+        plan = packer(cart)
+        cartons += len(plan)
+        mixed += plan.mixed_count
+        ranges += sum(count * len(carton['items']) for count, carton in plan.entries)
+    elapsed = (time.perf_counter() - started) * 1000 / max(len(carts), 1)
+    return cartons, mixed, ranges, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the carton packers")
+    parser.add_argument("--carts", type=int, default=200, help="carts per mix")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--budget", type=float, default=PACKING_TIME_BUDGET,
+                        help="solver time budget per cart in seconds")
+    args = parser.parse_args()
+
+    print(f"{'Mix':<20} {'Packer':<8} {'Cartons':>8} {'Mixed':>7} {'Ranges':>7} {'ms/cart':>8}")
+    print("-" * 62)
+    for name, make in MIXES.items():
+        rng = random.Random(args.seed)
+        carts = [make(rng) for _ in range(args.carts)]
+        for label, packer in [("current", pack_cartons_smart),
+                              ("solver", lambda cart: pack_cartons(cart, args.budget))]:
+            cartons, mixed, ranges, ms = measure(packer, carts)
+            print(f"{name:<20} {label:<8} {cartons:>8} {mixed:>7} {ranges:>7} {ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,55 @@ DATABASE_CONFIG = {
     "password": "master",
     "database": "barcode_system",
     "port": 3306,
+    "connection_timeout": 5,  # Seconds before giving up on an unreachable server
 }
 
+# Idle MySQL connections kept open for reuse (prepared statements live on them)
+DATABASE_POOL_SIZE = 4
+
+# Seconds a pooled connection may sit idle before it is replaced instead of reused
+DATABASE_POOL_MAX_IDLE = 60
+
+# Background threads running database calls for the GUI
+DB_WORKER_THREADS = 4
+
+# Recent calls per database function kept for the p50/p95/p99 diagnostics
+QUERY_STATS_WINDOW = 1000
+
+# Database calls slower than this are written to SLOW_QUERY_LOG (None disables it)
+SLOW_QUERY_THRESHOLD_MS = 500
+SLOW_QUERY_LOG = None  # e.g. "slow_queries.log"
+
+# Rows per multi-row INSERT when recording history in bulk
+HISTORY_BATCH_SIZE = 500
+
+# Seconds between version checks of the cached products/locations tables
+REFERENCE_CACHE_TTL = 30
+
+# Rows fetched per keyset page when streaming history exports
+EXPORT_PAGE_SIZE = 5000
+
+# Rows per page in the History tab
+HISTORY_PAGE_SIZE = 100
+
+# Monthly history partitions created ahead of the current month
+HISTORY_PARTITIONS_AHEAD = 3
+
+# Months of history kept in barcode_history; older partitions are archived
+HISTORY_RETENTION_MONTHS = 12
+
+# Local SQLite file holding history awaiting upload and reference snapshots
+LOCAL_STORE_PATH = "local_store.db"
+
+# Seconds between background attempts to upload locally recorded history
+SYNC_INTERVAL = 5
+
+# Printed labels buffered in memory before printing blocks on the history writer
+HISTORY_QUEUE_SIZE = 10000
+
+# Seconds the carton packer may spend searching for a packing without split ranges
+PACKING_TIME_BUDGET = 0.5
+
 # Barcode settings
 BARCODE_TYPE = "code128"  # Options: code128, code39, ean13, qrcode
 BARCODE_PREFIX = "PKG"    # Prefix for generated codes
@@ -3,29 +3,315 @@ Database module for managing products, locations, and barcode history
 Uses MySQL database
 """
 
+import csv
+import functools
+import gzip
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque, namedtuple
+from contextlib import closing
 import mysql.connector
-from mysql.connector import Error
-from datetime import datetime
+from mysql.connector import Error, errorcode
+from datetime import date, datetime, timedelta
 from typing import Optional
-from config import DATABASE_CONFIG
+from config import (DATABASE_CONFIG, DATABASE_POOL_SIZE, DATABASE_POOL_MAX_IDLE,
+                    HISTORY_BATCH_SIZE, HISTORY_PAGE_SIZE, HISTORY_PARTITIONS_AHEAD,
+                    HISTORY_RETENTION_MONTHS, REFERENCE_CACHE_TTL, EXPORT_PAGE_SIZE,
+                    QUERY_STATS_WINDOW, SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG)
+
+
+# ============== INSTRUMENTATION ==============
+
+_stats_lock = threading.Lock()
+# name -> deque of (seconds, connection_acquire_seconds, rows) for recent calls
+_call_samples = {}
+_call_counts = {}
+# Per-thread stack of [acquire_seconds] for the instrumented calls in progress
+_call_context = threading.local()
+
+# Public functions whose int result is an id or serial rather than a row count
+_ID_RESULTS = {"save_barcode_history", "add_product", "add_location",
+               "reserve_serials", "ensure_schema"}
+
+
+def _record_call(name: str, elapsed: float, acquire: float, rows: int, args=()):
+    with _stats_lock:
+        samples = _call_samples.get(name)
+        if samples is None:
+            samples = _call_samples[name] = deque(maxlen=QUERY_STATS_WINDOW)
+        samples.append((elapsed, acquire, rows))
+        _call_counts[name] = _call_counts.get(name, 0) + 1
+
+        if SLOW_QUERY_LOG and elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+            arguments = repr(args)
+            if len(arguments) > 200:
+                arguments = arguments[:200] + "..."
+            try:
+                with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+                    f.write(f"{datetime.now().isoformat(timespec='milliseconds')} {name} "
+                            f"total={elapsed * 1000:.1f}ms acquire={acquire * 1000:.1f}ms "
+                            f"rows={rows} args={arguments}\n")
+            except OSError:
+                pass
+
+
+def _row_count(name: str, result) -> int:
+    """Best-effort number of rows a public function returned or wrote"""
+    if result is None or isinstance(result, bool):
+        return 0
+    if isinstance(result, int):
+        return 1 if name in _ID_RESULTS else result
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], (list, dict)):
+        # (rows, next_cursor) pages
+        return _row_count(name, result[0])
+    if isinstance(result, dict):
+        first = next(iter(result.values()), None)
+        if isinstance(first, list):
+            return len(first)  # column format
+        return len(result) if isinstance(first, dict) else 1
+    return 1
+
+
+def _instrument(name: str, func):
+    """Wrap a public function to record its duration, connection acquire
+    time and row count. Generators are timed until exhausted or closed."""
+    def enter():
+        stack = getattr(_call_context, "stack", None)
+        if stack is None:
+            stack = _call_context.stack = []
+        frame = [0.0]
+        stack.append(frame)
+        return stack, frame
+
+    def leave(stack, frame):
+        # Remove this call's own frame from the stack it was pushed on: a
+        # generator can be closed after later calls returned, or on another thread
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is frame:
+                del stack[index]
+                break
+        return frame[0]
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack, frame = enter()
+            start = time.perf_counter()
+            rows = 0
+            try:
+                for item in func(*args, **kwargs):
+                    rows += 1
+                    yield item
+            finally:
+                acquire = leave(stack, frame)
+                _record_call(name, time.perf_counter() - start, acquire, rows, args)
+        return wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack, frame = enter()
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            acquire = leave(stack, frame)
+            _record_call(name, time.perf_counter() - start, acquire,
+                         _row_count(name, result), args)
+    return wrapper
+
+
+def _percentile(values, percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def query_stats() -> list:
+    """Latency summary per database function over the recent call window.
+
+    Returns dicts with name, calls (since start or reset), p50_ms, p95_ms,
+    p99_ms, max_ms, acquire_p50_ms and avg_rows, slowest p95 first.
+    """
+    with _stats_lock:
+        snapshot = {name: list(samples) for name, samples in _call_samples.items()}
+        counts = dict(_call_counts)
+
+    stats = []
+    for name, samples in snapshot.items():
+        durations = sorted(sample[0] * 1000 for sample in samples)
+        acquires = sorted(sample[1] * 1000 for sample in samples)
+        stats.append({
+            "name": name,
+            "calls": counts[name],
+            "p50_ms": _percentile(durations, 50),
+            "p95_ms": _percentile(durations, 95),
+            "p99_ms": _percentile(durations, 99),
+            "max_ms": durations[-1],
+            "acquire_p50_ms": _percentile(acquires, 50),
+            "avg_rows": sum(sample[2] for sample in samples) / len(samples),
+        })
+    stats.sort(key=lambda s: s["p95_ms"], reverse=True)
+    return stats
 
 
-def get_connection():
-    """Get MySQL database connection"""
+def reset_query_stats():
+    """Forget all recorded call timings"""
+    with _stats_lock:
+        _call_samples.clear()
+        _call_counts.clear()
+
+
+# Idle connections ready for reuse as (connection, returned_at), most recently
+# returned last, kept apart by autocommit mode so checkout never has to switch it
+_pool_lock = threading.Lock()
+_idle_connections = {False: [], True: []}
+
+# Errors that mean the connection itself is unusable rather than the statement
+_CONNECTION_ERRORS = (mysql.connector.errors.InterfaceError,
+                      mysql.connector.errors.OperationalError)
+
+
+class _PooledConnection:
+    """Connection checked out of the pool; close() hands it back for reuse.
+
+    Everything else is delegated to the underlying MySQL connection, so
+    callers keep the usual get_connection() ... conn.close() pattern.
+    """
+
+    def __init__(self, cnx, read_only: bool = False):
+        self._cnx = cnx
+        self._read_only = read_only
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def close(self):
+        cnx, self._cnx = self._cnx, None
+        if cnx is None:
+            return
+        # Closed while a lost-connection error propagates - drop it so the
+        # next checkout reconnects
+        if isinstance(sys.exc_info()[1], _CONNECTION_ERRORS):
+            _close_quietly(cnx)
+            return
+        try:
+            # Only an unfinished write leaves a transaction open here; reads
+            # run with autocommit and need no rollback round trip
+            if cnx.in_transaction:
+                cnx.rollback()
+        except Error:
+            _close_quietly(cnx)
+            return
+        with _pool_lock:
+            if sum(len(idle) for idle in _idle_connections.values()) < DATABASE_POOL_SIZE:
+                _idle_connections[self._read_only].append((cnx, time.monotonic()))
+                return
+        _close_quietly(cnx)
+
+
+def _close_quietly(cnx):
+    try:
+        cnx.close()
+    except Error:
+        pass
+
+
+def get_connection(read_only: bool = False):
+    """Get a MySQL database connection, reusing an idle pooled one if possible.
+
+    Pass read_only=True for calls that only SELECT: the connection runs with
+    autocommit, so no transaction is left open to roll back on close().
+    """
+    start = time.perf_counter()
+    try:
+        return _acquire_connection(read_only)
+    finally:
+        # Charge the wait to every instrumented call in progress on this thread
+        elapsed = time.perf_counter() - start
+        for frame in getattr(_call_context, "stack", ()):
+            frame[0] += elapsed
+        _record_call("get_connection", elapsed, elapsed, 0)
+
+
+def _acquire_connection(read_only: bool = False):
+    stale = []
+    with _pool_lock:
+        idle = _idle_connections[read_only]
+        cnx = None
+        while idle:
+            cnx, returned_at = idle.pop()
+            if time.monotonic() - returned_at < DATABASE_POOL_MAX_IDLE:
+                break
+            # Idle long enough for the server or a firewall to have dropped
+            # it - replace it rather than pinging on every checkout
+            stale.append(cnx)
+            cnx = None
+    for old in stale:
+        _close_quietly(old)
+    if cnx is not None:
+        return _PooledConnection(cnx, read_only)
+
     try:
         conn = mysql.connector.connect(
             host=DATABASE_CONFIG["host"],
             user=DATABASE_CONFIG["user"],
             password=DATABASE_CONFIG["password"],
             database=DATABASE_CONFIG["database"],
-            port=DATABASE_CONFIG.get("port", 3306)
+            port=DATABASE_CONFIG.get("port", 3306),
+            connection_timeout=DATABASE_CONFIG.get("connection_timeout", 10),
+            autocommit=read_only
         )
-        return conn
+        return _PooledConnection(conn, read_only)
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         raise
 
 
+def close_pool():
+    """Close every idle pooled connection"""
+    with _pool_lock:
+        idle = [cnx for connections in _idle_connections.values() for cnx, _ in connections]
+        for connections in _idle_connections.values():
+            connections.clear()
+    for cnx in idle:
+        _close_quietly(cnx)
+
+
+# Prepared cursors per raw connection: {connection: {query: cursor}}
+_prepared_cursors = weakref.WeakKeyDictionary()
+
+
+def _execute_prepared(conn, query: str, params=()):
+    """Execute a fixed query as a server-side prepared statement.
+
+    The statement is prepared the first time a pooled connection runs it and
+    then re-executed with new parameters only, skipping parse and plan. The
+    returned cursor belongs to the connection cache - fetch from it, but do
+    not close it.
+    """
+    cnx = getattr(conn, "_cnx", conn)
+    cursors = _prepared_cursors.setdefault(cnx, {})
+    cursor = cursors.get(query)
+    if cursor is None:
+        cursor = cnx.cursor(prepared=True)
+        cursors[query] = cursor
+    try:
+        cursor.execute(query, params)
+    except Error:
+        cursors.pop(query, None)
+        raise
+    return cursor
+
+
 def get_connection_without_db():
     """Get MySQL connection without selecting database (for initial setup)"""
     try:
@@ -33,7 +319,8 @@ def get_connection_without_db():
             host=DATABASE_CONFIG["host"],
             user=DATABASE_CONFIG["user"],
             password=DATABASE_CONFIG["password"],
-            port=DATABASE_CONFIG.get("port", 3306)
+            port=DATABASE_CONFIG.get("port", 3306),
+            connection_timeout=DATABASE_CONFIG.get("connection_timeout", 10)
         )
         return conn
     except Error as e:
@@ -42,7 +329,7 @@ def get_connection_without_db():
 
 
 def init_database():
-    """Initialize database with required tables"""
+    """Create the database if needed and bring its schema up to date"""
     # First, create database if not exists
     try:
         conn = get_connection_without_db()
@@ -55,10 +342,90 @@ def init_database():
         print(f"Error creating database: {e}")
         raise
 
-    # Now connect to the database and create tables
+    # Now connect to the database and apply pending migrations
+    migrate()
+    print("Database initialized successfully!")
+
+
+def ensure_schema() -> int:
+    """Apply pending migrations, creating the database on first run.
+
+    Returns the schema version. This is the explicit startup step that
+    replaces the old initialise-on-import behaviour; when the schema is
+    already current it costs a single query, followed by the one-time
+    schema capability probe.
+    """
+    try:
+        migrate()
+    except Error as e:
+        if e.errno != errorcode.ER_BAD_DB_ERROR:
+            raise
+        init_database()
+    try:
+        maintain_history_partitions()
+    except Error as e:
+        # Startup must not depend on partition maintenance; the next start retries
+        print(f"Partition maintenance skipped: {e}")
+    return get_schema_capabilities(refresh=True)["version"]
+
+
+def migrate() -> int:
+    """Apply pending schema migrations in order and return the schema version.
+
+    Applied versions are recorded in the schema_version table. Every migration
+    is idempotent, so databases created before versioning existed are brought
+    up to date by replaying all of them. Stations starting at the same time
+    take turns on a named lock, and the version is re-read under it, so each
+    migration runs once.
+    """
     conn = get_connection()
     cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description VARCHAR(100),
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        current = cursor.fetchone()[0]
+        if current >= SCHEMA_VERSION:
+            return current
+
+        # Rewriting barcode_history can take minutes on a large table
+        cursor.execute("SELECT GET_LOCK('barcode_schema_migrate', 600)")
+        if not cursor.fetchone()[0]:
+            raise Error(msg="Timed out waiting for another station to finish migrating the schema")
+        try:
+            # End the read snapshot so versions applied while waiting are seen
+            conn.commit()
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current = cursor.fetchone()[0]
+
+            for version, description, apply in MIGRATIONS:
+                if version <= current:
+                    continue
+                apply(cursor)
+                # IGNORE: a station without the lock (older version) may have applied it too
+                cursor.execute(
+                    "INSERT IGNORE INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+                print(f"Applied schema migration {version}: {description}")
+                current = version
+        finally:
+            cursor.execute("DO RELEASE_LOCK('barcode_schema_migrate')")
+    finally:
+        cursor.close()
+        conn.close()
+    return current
+
 
+# ============== SCHEMA MIGRATIONS ==============
+
+def _migration_base_tables(cursor):
     # Products table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS products (
@@ -99,17 +466,396 @@ def init_database():
     ''')
 
     # Add delivery_code column if it doesn't exist (for existing databases)
-    try:
-        cursor.execute('''
-            ALTER TABLE barcode_history ADD COLUMN IF NOT EXISTS delivery_code VARCHAR(10)
-        ''')
-    except:
-        pass
+    _ensure_column(cursor, "barcode_history", "delivery_code", "VARCHAR(10)")
+
+
+def _migration_serial_ranges(cursor):
+    # One row per contiguous serial range instead of one row per label
+    _ensure_column(cursor, "barcode_history", "start_serial", "INT")
+    _ensure_column(cursor, "barcode_history", "end_serial", "INT")
+
+
+def _migration_stats_indexes(cursor):
+    # Covering indexes so the daily stats queries are index-only range scans
+    _ensure_index(cursor, "barcode_history", "idx_created_location",
+                  "created_at, location_id, quantity, start_serial, end_serial")
+    _ensure_index(cursor, "barcode_history", "idx_created_delivery",
+                  "created_at, delivery_code, quantity, start_serial, end_serial")
+
+
+# Aggregates barcode_history into rollup rows; {where} restricts the history read
+_ROLLUP_AGGREGATE = '''
+    INSERT INTO barcode_daily_rollup
+        (day, location_id, product_id, delivery_code, total_labels, total_items)
+    SELECT
+        DATE(created_at),
+        COALESCE(location_id, 0),
+        COALESCE(product_id, 0),
+        COALESCE(delivery_code, ''),
+        SUM(COALESCE(end_serial - start_serial + 1, 1)),
+        SUM(quantity)
+    FROM barcode_history
+    {where}
+    GROUP BY DATE(created_at), COALESCE(location_id, 0),
+             COALESCE(product_id, 0), COALESCE(delivery_code, '')
+'''
+
+
+def _migration_daily_rollup(cursor):
+    # Daily rollup of history, maintained by the history write path
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS barcode_daily_rollup (
+            day DATE NOT NULL,
+            location_id INT NOT NULL DEFAULT 0,
+            product_id INT NOT NULL DEFAULT 0,
+            delivery_code VARCHAR(10) NOT NULL DEFAULT '',
+            total_labels INT NOT NULL DEFAULT 0,
+            total_items INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, location_id, product_id, delivery_code)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    ''')
+    # Seed it from existing history so stats are right straight after the
+    # upgrade; overwriting keeps a replayed migration idempotent
+    cursor.execute(
+        _ROLLUP_AGGREGATE.format(where="")
+        + " ON DUPLICATE KEY UPDATE"
+          " total_labels = VALUES(total_labels),"
+          " total_items = VALUES(total_items)"
+    )
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print("Database initialized successfully!")
+
+def _migration_reference_updated_at(cursor):
+    # updated_at columns used for reference cache change detection
+    for table in ("products", "locations"):
+        _ensure_column(cursor, table, "updated_at",
+                       "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+
+
+def _migration_history_sync_ids(cursor):
+    # Client-generated ids make replaying offline history idempotent
+    _ensure_column(cursor, "barcode_history", "sync_id", "CHAR(32)")
+    _ensure_index(cursor, "barcode_history", "uq_sync_id", "sync_id", unique=True)
+
+
+def _migration_serial_counters(cursor):
+    # Next free serial per location/product, shared by every packing station
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS serial_counters (
+            location_id INT NOT NULL,
+            product_id INT NOT NULL,
+            next_serial INT NOT NULL,
+            PRIMARY KEY (location_id, product_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    ''')
+    # Continue after the highest serial already printed (legacy rows only
+    # carry the serial as the last part of barcode_data)
+    cursor.execute('''
+        INSERT IGNORE INTO serial_counters (location_id, product_id, next_serial)
+        SELECT location_id, product_id,
+               MAX(COALESCE(end_serial,
+                   CASE WHEN SUBSTRING_INDEX(barcode_data, '-', -1) REGEXP '^[0-9]+$'
+                        THEN CAST(SUBSTRING_INDEX(barcode_data, '-', -1) AS UNSIGNED)
+                        ELSE 0 END)) + 1
+        FROM barcode_history
+        WHERE location_id IS NOT NULL AND product_id IS NOT NULL
+        GROUP BY location_id, product_id
+    ''')
+
+
+def _migration_barcode_index(cursor):
+    # Scanned-barcode lookups and prefix searches seek on barcode_data
+    _ensure_index(cursor, "barcode_history", "idx_barcode_data", "barcode_data")
+
+
+def _migration_history_partitions(cursor):
+    # Monthly RANGE partitions on created_at so old months can be archived
+    # by dropping a partition instead of deleting rows
+    if _history_partitions(cursor):
+        return
+
+    # Partitioned InnoDB tables cannot have foreign keys; delete_product and
+    # delete_location clear the references themselves instead
+    cursor.execute('''
+        SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'barcode_history'
+    ''')
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE barcode_history DROP FOREIGN KEY {name}")
+
+    # Every unique key must include the partitioning column. sync_id rows
+    # keep the created_at they were recorded with, so replays still collide
+    cursor.execute('''
+        ALTER TABLE barcode_history
+            DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at),
+            DROP INDEX uq_sync_id, ADD UNIQUE INDEX uq_sync_id (sync_id, created_at)
+    ''')
+
+    cursor.execute("SELECT MIN(created_at) FROM barcode_history")
+    first = cursor.fetchone()[0] or datetime.now()
+    months = _months_between(first.date(), _add_months(_month_start(date.today()),
+                                                       HISTORY_PARTITIONS_AHEAD))
+    cursor.execute(
+        "ALTER TABLE barcode_history PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) ("
+        + ", ".join(_partition_definition(month) for month in months)
+        + ", PARTITION pmax VALUES LESS THAN MAXVALUE)"
+    )
+
+
+# (version, description, migration) - append new migrations, never reorder
+MIGRATIONS = [
+    (1, "base tables", _migration_base_tables),
+    (2, "history serial ranges", _migration_serial_ranges),
+    (3, "history stats covering indexes", _migration_stats_indexes),
+    (4, "daily rollup table", _migration_daily_rollup),
+    (5, "reference data updated_at", _migration_reference_updated_at),
+    (6, "history sync ids", _migration_history_sync_ids),
+    (7, "serial counters", _migration_serial_counters),
+    (8, "barcode_data index", _migration_barcode_index),
+    (9, "monthly history partitions", _migration_history_partitions),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_column(cursor, table: str, column: str, definition: str):
+    """Add a column to an existing table unless it is already there"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+    ''', (table, column))
+    if cursor.fetchone() is None:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _ensure_index(cursor, table: str, index_name: str, columns: str, unique: bool = False):
+    """Add an index to an existing table unless it is already there"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    ''', (table, index_name))
+    if cursor.fetchone() is None:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"ALTER TABLE {table} ADD {kind} {index_name} ({columns})")
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _months_between(first: date, last: date) -> list:
+    """First days of every month from first's month to last's month inclusive"""
+    months = []
+    month = _month_start(first)
+    while month <= last:
+        months.append(month)
+        month = _add_months(month, 1)
+    return months
+
+
+def _partition_definition(month: date) -> str:
+    """Partition p<YYYYMM> holding rows created before the next month starts"""
+    return (f"PARTITION p{month:%Y%m} VALUES LESS THAN "
+            f"(UNIX_TIMESTAMP('{_add_months(month, 1):%Y-%m-%d} 00:00:00'))")
+
+
+def _history_partitions(cursor) -> list:
+    """Names of barcode_history's partitions in order (empty if unpartitioned)"""
+    cursor.execute('''
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'barcode_history'
+          AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    ''')
+    return [name for (name,) in cursor.fetchall()]
+
+
+def _day_bounds(start_date: str, end_date: Optional[str] = None):
+    """Return half-open [start, end) timestamps covering whole days.
+
+    Comparing created_at against plain timestamps (rather than DATE(created_at))
+    keeps the predicates sargable so MySQL can range-scan the created_at indexes.
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date or start_date, "%Y-%m-%d") + timedelta(days=1)
+    return start, end
+
+
+# ============== SCHEMA CAPABILITIES ==============
+
+_schema_lock = threading.Lock()
+_schema_capabilities = None
+_statements = None
+
+
+def get_schema_capabilities(refresh: bool = False) -> dict:
+    """Probe the connected schema once and cache what it supports.
+
+    Returns a dict with the schema version and flags for the delivery_code
+    column, serial range columns, the daily rollup table, offline sync ids
+    and the legacy packer_id column. The SQL variants matching those flags are compiled at
+    the same time, so history and stats calls never need a failed round trip
+    to discover the schema. Pass refresh=True after changing the schema.
+    """
+    global _schema_capabilities, _statements
+    if _schema_capabilities is not None and not refresh:
+        return _schema_capabilities
+
+    with _schema_lock:
+        if _schema_capabilities is not None and not refresh:
+            return _schema_capabilities
+
+        conn = get_connection(read_only=True)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT table_name, column_name FROM information_schema.columns
+                WHERE table_schema = DATABASE()
+                  AND table_name IN ('barcode_history', 'barcode_daily_rollup', 'schema_version')
+            ''')
+            columns = {(str(table).lower(), str(column).lower()) for table, column in cursor.fetchall()}
+            version = 0
+            if ("schema_version", "version") in columns:
+                cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                version = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            conn.close()
+
+        capabilities = {
+            "version": version,
+            "delivery_code": ("barcode_history", "delivery_code") in columns,
+            "serial_ranges": ("barcode_history", "start_serial") in columns
+                             and ("barcode_history", "end_serial") in columns,
+            "daily_rollup": ("barcode_daily_rollup", "day") in columns,
+            "packers": ("barcode_history", "packer_id") in columns,
+            "sync_id": ("barcode_history", "sync_id") in columns,
+        }
+        _statements = _compile_statements(capabilities)
+        _schema_capabilities = capabilities
+    return capabilities
+
+
+def _statement(name: str) -> str:
+    """Get the SQL variant of a statement matching the probed schema"""
+    get_schema_capabilities()
+    return _statements[name]
+
+
+def _compile_statements(capabilities: dict) -> dict:
+    """Build the statement variants for a schema's capabilities"""
+    delivery = capabilities["delivery_code"]
+    ranges = capabilities["serial_ranges"]
+    packers = capabilities["packers"] and not delivery
+
+    insert_columns = ["barcode_data", "product_id", "location_id", "quantity"]
+    if delivery:
+        insert_columns.insert(3, "delivery_code")
+
+    history_columns = ",\n                ".join([
+        "bh.delivery_code" if delivery else "NULL as delivery_code",
+        "bh.start_serial" if ranges else "NULL as start_serial",
+        "bh.end_serial" if ranges else "NULL as end_serial",
+    ])
+    labels_expr = "COALESCE(bh.end_serial - bh.start_serial + 1, 1)" if ranges else "1"
+    packer_column = ",\n                pk.name as packer_name" if packers else ""
+    packer_join = "\n            LEFT JOIN packers pk ON bh.packer_id = pk.id" if packers else ""
+
+    statements = {
+        "history_insert_columns": tuple(insert_columns),
+        "history_insert": (
+            f"INSERT INTO barcode_history ({', '.join(insert_columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(insert_columns))})"
+        ),
+        "history_columns": history_columns,
+        # {keyset} is filled in per call with the optional page cursor predicate
+        "history_select": f'''
+            SELECT
+                bh.id,
+                bh.barcode_data,
+                bh.quantity,
+                bh.created_at,
+                {history_columns},
+                p.code as product_code,
+                p.name as product_name,
+                l.code as location_code,
+                l.name as location_name{packer_column}
+            FROM barcode_history bh
+            LEFT JOIN products p ON bh.product_id = p.id
+            LEFT JOIN locations l ON bh.location_id = l.id{packer_join}
+            {{keyset}}
+            ORDER BY bh.created_at DESC, bh.id DESC
+            LIMIT %s
+        ''',
+    }
+
+    # Stats take (period_start, period_end) timestamps in every variant
+    if capabilities["daily_rollup"]:
+        statements["daily_stats"] = '''
+            SELECT
+                delivery_code,
+                SUM(total_labels) as total_labels,
+                SUM(total_items) as total_items
+            FROM barcode_daily_rollup
+            WHERE day >= DATE(%s) AND day < DATE(%s) AND delivery_code <> ''
+            GROUP BY delivery_code
+            ORDER BY total_items DESC
+        '''
+        statements["location_stats"] = '''
+            SELECT
+                l.code as location_code,
+                l.name as location_name,
+                SUM(r.total_labels) as total_labels,
+                SUM(r.total_items) as total_items
+            FROM barcode_daily_rollup r
+            JOIN locations l ON r.location_id = l.id
+            WHERE r.day >= DATE(%s) AND r.day < DATE(%s)
+            GROUP BY r.location_id, l.code, l.name
+            ORDER BY total_items DESC
+        '''
+    else:
+        if packers:
+            # Legacy schema - statistics per packer
+            statements["daily_stats"] = '''
+                SELECT
+                    pk.name as packer_name,
+                    COUNT(*) as total_labels,
+                    SUM(bh.quantity) as total_items
+                FROM barcode_history bh
+                JOIN packers pk ON bh.packer_id = pk.id
+                WHERE bh.created_at >= %s AND bh.created_at < %s
+                GROUP BY bh.packer_id, pk.name
+                ORDER BY total_items DESC
+            '''
+        else:
+            statements["daily_stats"] = f'''
+                SELECT
+                    bh.delivery_code,
+                    SUM({labels_expr}) as total_labels,
+                    SUM(bh.quantity) as total_items
+                FROM barcode_history bh
+                WHERE bh.created_at >= %s AND bh.created_at < %s AND bh.delivery_code IS NOT NULL
+                GROUP BY bh.delivery_code
+                ORDER BY total_items DESC
+            '''
+        statements["location_stats"] = f'''
+            SELECT
+                l.code as location_code,
+                l.name as location_name,
+                SUM({labels_expr}) as total_labels,
+                SUM(bh.quantity) as total_items
+            FROM barcode_history bh
+            JOIN locations l ON bh.location_id = l.id
+            WHERE bh.created_at >= %s AND bh.created_at < %s
+            GROUP BY bh.location_id, l.code, l.name
+            ORDER BY total_items DESC
+        '''
+    return statements
 
 
 def row_to_dict(cursor, row):
@@ -126,6 +872,221 @@ def rows_to_dicts(cursor, rows):
     return [dict(zip(columns, row)) for row in rows]
 
 
+@functools.lru_cache(maxsize=64)
+def _record_class(columns: tuple):
+    """__slots__ record type for a column list, cached per column tuple"""
+    def __init__(self, values):
+        for name, value in zip(columns, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in columns)
+        return f"Record({fields})"
+
+    return type("Record", (), {
+        "__slots__": columns,
+        "__init__": __init__,
+        "__getitem__": __getitem__,
+        "get": get,
+        "__repr__": __repr__,
+    })
+
+
+@functools.lru_cache(maxsize=64)
+def _namedtuple_class(columns: tuple):
+    return namedtuple("Row", columns, rename=True)
+
+
+ROW_FORMATS = ("dict", "record", "tuple", "columns")
+
+
+def convert_rows(cursor, rows, row_format: str = "dict"):
+    """Convert fetched rows into the requested representation.
+
+    - "dict": a list of dicts (the default, as rows_to_dicts)
+    - "record": a list of __slots__ objects; attribute access, and row["col"]
+      / row.get("col") for code written against dicts, without a per-row
+      hash table
+    - "tuple": a list of named tuples
+    - "columns": one dict of {column: [values]} for column-wise processing
+    """
+    columns = tuple(col[0] for col in cursor.description)
+    if row_format == "dict":
+        return [dict(zip(columns, row)) for row in rows]
+    if row_format == "record":
+        record = _record_class(columns)
+        return [record(row) for row in rows]
+    if row_format == "tuple":
+        return list(map(_namedtuple_class(columns)._make, rows))
+    if row_format == "columns":
+        values = list(zip(*rows)) or [()] * len(columns)
+        return {name: list(column) for name, column in zip(columns, values)}
+    raise ValueError(f"Unknown row format: {row_format}")
+
+
+def _insert_batches(cursor, table: str, columns, rows, batch_size: int = HISTORY_BATCH_SIZE) -> int:
+    """Insert rows using one multi-row INSERT statement per batch.
+
+    Returns the number of rows inserted. The caller owns the transaction.
+    """
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+
+    inserted = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.execute(statement + ", ".join([placeholders] * len(batch)),
+                           [value for item in batch for value in item])
+            inserted += len(batch)
+            batch = []
+
+    if batch:
+        cursor.execute(statement + ", ".join([placeholders] * len(batch)),
+                       [value for item in batch for value in item])
+        inserted += len(batch)
+
+    return inserted
+
+
+# ============== REFERENCE DATA CACHE ==============
+
+class ReferenceCache:
+    """In-process copy of a small reference table with O(1) lookups.
+
+    Rows are indexed by id and by code. At most once every REFERENCE_CACHE_TTL
+    seconds a cheap COUNT(*)/MAX(updated_at) query checks whether the table
+    changed; the rows are only re-read when that version differs. Writes made
+    through this module invalidate the cache immediately.
+
+    With a snapshot_store attached, every fresh read is saved locally and the
+    saved rows are served while the server is unreachable.
+    """
+
+    def __init__(self, table: str, ttl: float = REFERENCE_CACHE_TTL):
+        self.table = table
+        self.ttl = ttl
+        # Optional local store with save/load_reference_snapshot() used offline
+        self.snapshot_store = None
+        self._rows = []
+        self._by_id = {}
+        self._by_code = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Force the next lookup to re-check the table"""
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+    def _refresh(self):
+        if self._version is not None and time.monotonic() - self._checked_at < self.ttl:
+            return
+
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.ttl:
+                return
+
+            try:
+                conn = get_connection(read_only=True)
+            except Error:
+                if self.snapshot_store is None:
+                    raise
+                # Offline - serve the last saved snapshot and retry after the TTL
+                if not self._rows:
+                    self._load(self.snapshot_store.load_reference_snapshot(self.table) or [])
+                self._version = self._version or ("offline",)
+                self._checked_at = time.monotonic()
+                return
+
+            cursor = conn.cursor()
+            try:
+                version = tuple(_execute_prepared(
+                    conn, f"SELECT COUNT(*), MAX(updated_at) FROM {self.table}").fetchall()[0])
+                if version != self._version:
+                    cursor.execute(f"SELECT * FROM {self.table} ORDER BY name")
+                    self._load(rows_to_dicts(cursor, cursor.fetchall()))
+                    self._version = version
+                    if self.snapshot_store is not None:
+                        self.snapshot_store.save_reference_snapshot(self.table, self._rows)
+            finally:
+                cursor.close()
+                conn.close()
+            self._checked_at = time.monotonic()
+
+    def prime(self, rows):
+        """Install rows read elsewhere (e.g. by load_snapshot) as the current
+        copy, skipping the next version check"""
+        version = (len(rows), max((row['updated_at'] for row in rows
+                                   if row.get('updated_at') is not None), default=None))
+        with self._lock:
+            self._load(rows)
+            self._version = version
+            self._checked_at = time.monotonic()
+        if self.snapshot_store is not None:
+            self.snapshot_store.save_reference_snapshot(self.table, rows)
+
+    def seed(self, rows):
+        """Fill an empty cache with rows saved on disk so lookups work before
+        the first version check; the version stays unknown, so the next
+        checked lookup still reads the server"""
+        with self._lock:
+            if not self._rows:
+                self._load(rows)
+
+    def _load(self, rows):
+        self._rows = rows
+        self._by_id = {row['id']: row for row in rows}
+        self._by_code = {row['code']: row for row in rows}
+
+    def all(self):
+        """All rows ordered by name"""
+        self._refresh()
+        return list(self._rows)
+
+    def by_id(self, row_id: int):
+        self._refresh()
+        return self._by_id.get(row_id)
+
+    def by_code(self, code: str):
+        self._refresh()
+        return self._by_code.get(str(code).upper())
+
+    def refresh(self):
+        """Run the version check if the TTL has passed (may wait on the network)"""
+        self._refresh()
+
+    def cached_by_code(self, code: str):
+        """Look a code up in the current copy without a version check, so it
+        never waits on the network; for the GUI thread"""
+        return self._by_code.get(str(code).upper())
+
+
+products_cache = ReferenceCache("products")
+locations_cache = ReferenceCache("locations")
+
+
+def set_snapshot_store(store):
+    """Keep local snapshots of products and locations for offline reads"""
+    products_cache.snapshot_store = store
+    locations_cache.snapshot_store = store
+
+
+def invalidate_reference_cache():
+    """Drop cached products and locations"""
+    products_cache.invalidate()
+    locations_cache.invalidate()
+
+
 # ============== PRODUCT FUNCTIONS ==============
 
 def add_product(code: str, name: str, description: str = "") -> int:
@@ -140,12 +1101,13 @@ def add_product(code: str, name: str, description: str = "") -> int:
     product_id = cursor.lastrowid
     cursor.close()
     conn.close()
+    products_cache.invalidate()
     return product_id
 
 
 def get_all_products():
     """Get all products"""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM products ORDER BY name")
     rows = cursor.fetchall()
@@ -157,12 +1119,10 @@ def get_all_products():
 
 def get_product_by_id(product_id: int):
     """Get product by ID"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
-    row = cursor.fetchone()
-    product = row_to_dict(cursor, row)
-    cursor.close()
+    conn = get_connection(read_only=True)
+    cursor = _execute_prepared(conn, "SELECT * FROM products WHERE id = %s", (product_id,))
+    rows = cursor.fetchall()
+    product = row_to_dict(cursor, rows[0] if rows else None)
     conn.close()
     return product
 
@@ -192,6 +1152,7 @@ def update_product(product_id: int, code: str = None, name: str = None, descript
             tuple(values)
         )
         conn.commit()
+        products_cache.invalidate()
 
     cursor.close()
     conn.close()
@@ -201,10 +1162,13 @@ def delete_product(product_id: int):
     """Delete a product"""
     conn = get_connection()
     cursor = conn.cursor()
+    # History keeps its rows; the partitioned table has no foreign key to do this
+    cursor.execute("UPDATE barcode_history SET product_id = NULL WHERE product_id = %s", (product_id,))
     cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
     conn.commit()
     cursor.close()
     conn.close()
+    products_cache.invalidate()
 
 
 # ============== LOCATION FUNCTIONS ==============
@@ -221,12 +1185,13 @@ def add_location(code: str, name: str, address: str = "") -> int:
     location_id = cursor.lastrowid
     cursor.close()
     conn.close()
+    locations_cache.invalidate()
     return location_id
 
 
 def get_all_locations():
     """Get all locations"""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM locations ORDER BY name")
     rows = cursor.fetchall()
@@ -238,12 +1203,10 @@ def get_all_locations():
 
 def get_location_by_id(location_id: int):
     """Get location by ID"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM locations WHERE id = %s", (location_id,))
-    row = cursor.fetchone()
-    location = row_to_dict(cursor, row)
-    cursor.close()
+    conn = get_connection(read_only=True)
+    cursor = _execute_prepared(conn, "SELECT * FROM locations WHERE id = %s", (location_id,))
+    rows = cursor.fetchall()
+    location = row_to_dict(cursor, rows[0] if rows else None)
     conn.close()
     return location
 
@@ -273,6 +1236,7 @@ def update_location(location_id: int, code: str = None, name: str = None, addres
             tuple(values)
         )
         conn.commit()
+        locations_cache.invalidate()
 
     cursor.close()
     conn.close()
@@ -282,10 +1246,13 @@ def delete_location(location_id: int):
     """Delete a location"""
     conn = get_connection()
     cursor = conn.cursor()
+    # History keeps its rows; the partitioned table has no foreign key to do this
+    cursor.execute("UPDATE barcode_history SET location_id = NULL WHERE location_id = %s", (location_id,))
     cursor.execute("DELETE FROM locations WHERE id = %s", (location_id,))
     conn.commit()
     cursor.close()
     conn.close()
+    locations_cache.invalidate()
 
 
 # ============== BARCODE HISTORY FUNCTIONS ==============
@@ -294,89 +1261,426 @@ def save_barcode_history(barcode_data: str, product_id: int,
                          location_id: int, delivery_code: str,
                          quantity: int = 1) -> int:
     """Save barcode generation to history"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    capabilities = get_schema_capabilities()
+    if capabilities["delivery_code"]:
+        values = (barcode_data, product_id, location_id, delivery_code, quantity)
+    else:
+        # Legacy schema without delivery_code column
+        values = (barcode_data, product_id, location_id, quantity)
 
-    # Check if delivery_code column exists, if not use legacy packer_id column
-    try:
-        cursor.execute(
-            """INSERT INTO barcode_history
-               (barcode_data, product_id, location_id, delivery_code, quantity)
-               VALUES (%s, %s, %s, %s, %s)""",
-            (barcode_data, product_id, location_id, delivery_code, quantity)
-        )
-    except Error:
-        # Fallback for legacy schema - use packer_id column to store delivery code info
-        cursor.execute(
-            """INSERT INTO barcode_history
-               (barcode_data, product_id, location_id, quantity)
-               VALUES (%s, %s, %s, %s)""",
-            (barcode_data, product_id, location_id, quantity)
-        )
+    conn = get_connection()
+    history_id = _execute_prepared(conn, _statement("history_insert"), values).lastrowid
 
+    if capabilities["daily_rollup"]:
+        cursor = conn.cursor()
+        _update_daily_rollup(cursor, [(product_id, location_id, delivery_code, 1, quantity)])
+        cursor.close()
     conn.commit()
-    history_id = cursor.lastrowid
-    cursor.close()
     conn.close()
     return history_id
 
 
-def get_barcode_history(limit: int = 100):
-    """Get recent barcode history with details"""
+def save_barcode_history_bulk(rows, batch_size: int = HISTORY_BATCH_SIZE) -> int:
+    """Save many barcode history rows in a single transaction.
+
+    Each row is a (barcode_data, product_id, location_id, delivery_code, quantity)
+    tuple. Rows are written with multi-row INSERTs of up to batch_size rows, so
+    recording thousands of labels costs a handful of round trips and one commit.
+    Returns the number of rows saved.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    capabilities = get_schema_capabilities()
+    if capabilities["delivery_code"]:
+        values = rows
+    else:
+        # Legacy schema without delivery_code column
+        values = [(row[0], row[1], row[2], row[4]) for row in rows]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        saved = _insert_batches(cursor, "barcode_history",
+                                _statement("history_insert_columns"), values, batch_size)
+        if capabilities["daily_rollup"]:
+            _update_daily_rollup(cursor, ((row[1], row[2], row[3], 1, row[4]) for row in rows))
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return saved
+
+
+def _update_daily_rollup(cursor, entries, day=None):
+    """Add history entries to a day's rollup counters (default today).
+
+    entries is an iterable of (product_id, location_id, delivery_code,
+    labels, items). Entries are summed per key first so each call is a single
+    INSERT ... ON DUPLICATE KEY UPDATE. The caller owns the transaction.
+    """
+    totals = {}
+    for product_id, location_id, delivery_code, labels, items in entries:
+        key = (location_id or 0, product_id or 0, delivery_code or "")
+        counts = totals.setdefault(key, [0, 0])
+        counts[0] += labels
+        counts[1] += items
+
+    if not totals:
+        return
+
+    cursor.execute(
+        "INSERT INTO barcode_daily_rollup "
+        "(day, location_id, product_id, delivery_code, total_labels, total_items) VALUES "
+        + ", ".join(["(COALESCE(%s, CURDATE()), %s, %s, %s, %s, %s)"] * len(totals))
+        + " ON DUPLICATE KEY UPDATE"
+          " total_labels = total_labels + VALUES(total_labels),"
+          " total_items = total_items + VALUES(total_items)",
+        [value for key, counts in totals.items() for value in (day, *key, *counts)]
+    )
+
+
+def rebuild_daily_rollup(start_date: Optional[str] = None, end_date: Optional[str] = None) -> int:
+    """Backfill barcode_daily_rollup from barcode_history.
+
+    Rebuilds the given day range (inclusive, YYYY-MM-DD), or every day still
+    held in barcode_history when no dates are given. Days before the oldest
+    remaining history belong to archived months and keep their rollup rows.
+    Returns the number of rollup rows written.
+    """
     conn = get_connection()
     cursor = conn.cursor()
+    try:
+        if start_date is None:
+            cursor.execute("SELECT MIN(created_at) FROM barcode_history")
+            oldest = cursor.fetchone()[0]
+            if oldest is None:
+                return 0
+            cursor.execute("DELETE FROM barcode_daily_rollup WHERE day >= %s", (oldest.date(),))
+            cursor.execute(_ROLLUP_AGGREGATE.format(where=""))
+        else:
+            day_start, day_end = _day_bounds(start_date, end_date)
+            cursor.execute(
+                "DELETE FROM barcode_daily_rollup WHERE day >= %s AND day < %s",
+                (day_start.date(), day_end.date())
+            )
+            cursor.execute(
+                _ROLLUP_AGGREGATE.format(where="WHERE created_at >= %s AND created_at < %s"),
+                (day_start, day_end)
+            )
+        written = cursor.rowcount
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return written
+
+
+def build_history_ranges(labels):
+    """Collapse printed labels into contiguous serial ranges.
+
+    labels is an iterable of (barcode_data, product_id, location_id,
+    delivery_code, serial) tuples in print order. Consecutive labels for the
+    same product, location and delivery code with consecutive serials are
+    merged, yielding (barcode_data, product_id, location_id, delivery_code,
+    start_serial, end_serial) tuples where barcode_data is the first label.
+    """
+    current = None
+    for barcode_data, product_id, location_id, delivery_code, serial in labels:
+        if (current is not None
+                and tuple(current[1:4]) == (product_id, location_id, delivery_code)
+                and serial == current[5] + 1):
+            current[5] = serial
+            continue
+        if current is not None:
+            yield tuple(current)
+        current = [barcode_data, product_id, location_id, delivery_code, serial, serial]
+    if current is not None:
+        yield tuple(current)
+
+
+def save_history_ranges(ranges, batch_size: int = HISTORY_BATCH_SIZE) -> int:
+    """Save serial ranges to history, one row per contiguous range.
+
+    Each range is a (barcode_data, product_id, location_id, delivery_code,
+    start_serial, end_serial) tuple as produced by build_history_ranges().
+    quantity is stored as the number of labels in the range.
+    Returns the number of rows saved. On a schema without serial range
+    columns the ranges are expanded and saved one row per label instead.
+    """
+    if not get_schema_capabilities()["serial_ranges"]:
+        return save_barcode_history_bulk(
+            (row['barcode_data'], row['product_id'], row['location_id'], row['delivery_code'], 1)
+            for barcode_data, product_id, location_id, delivery_code, start_serial, end_serial in ranges
+            for row in expand_history_row({
+                'barcode_data': barcode_data, 'product_id': product_id,
+                'location_id': location_id, 'delivery_code': delivery_code,
+                'start_serial': start_serial, 'end_serial': end_serial,
+            })
+        )
+
+    rows = [
+        (barcode_data, product_id, location_id, delivery_code,
+         end_serial - start_serial + 1, start_serial, end_serial)
+        for barcode_data, product_id, location_id, delivery_code, start_serial, end_serial in ranges
+    ]
+    if not rows:
+        return 0
 
-    # Try to use new schema with delivery_code
+    conn = get_connection()
+    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT
-                bh.id,
-                bh.barcode_data,
-                bh.quantity,
-                bh.created_at,
-                bh.delivery_code,
-                p.code as product_code,
-                p.name as product_name,
-                l.code as location_code,
-                l.name as location_name
-            FROM barcode_history bh
-            LEFT JOIN products p ON bh.product_id = p.id
-            LEFT JOIN locations l ON bh.location_id = l.id
-            ORDER BY bh.created_at DESC
-            LIMIT %s
-        ''', (limit,))
+        saved = _insert_batches(
+            cursor, "barcode_history",
+            ("barcode_data", "product_id", "location_id", "delivery_code",
+             "quantity", "start_serial", "end_serial"),
+            rows, batch_size
+        )
+        if get_schema_capabilities()["daily_rollup"]:
+            _update_daily_rollup(cursor, ((row[1], row[2], row[3], row[4], row[4]) for row in rows))
+        conn.commit()
     except Error:
-        # Fallback for legacy schema
-        cursor.execute('''
-            SELECT
-                bh.id,
-                bh.barcode_data,
-                bh.quantity,
-                bh.created_at,
-                NULL as delivery_code,
-                p.code as product_code,
-                p.name as product_name,
-                l.code as location_code,
-                l.name as location_name,
-                pk.name as packer_name
-            FROM barcode_history bh
-            LEFT JOIN products p ON bh.product_id = p.id
-            LEFT JOIN locations l ON bh.location_id = l.id
-            LEFT JOIN packers pk ON bh.packer_id = pk.id
-            ORDER BY bh.created_at DESC
-            LIMIT %s
-        ''', (limit,))
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return saved
 
+
+def sync_history_ranges(rows, batch_size: int = HISTORY_BATCH_SIZE) -> int:
+    """Idempotently upsert history ranges recorded while offline.
+
+    Each row is a (sync_id, barcode_data, product_id, location_id,
+    delivery_code, start_serial, end_serial, created_at) tuple where sync_id
+    is unique per range and created_at is when it was printed. Ranges whose
+    sync_id is already on the server are skipped, so a batch can be replayed
+    safely after a lost commit acknowledgement. Returns the number of rows
+    newly written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    if not get_schema_capabilities()["sync_id"]:
+        # Without sync ids the server cannot de-duplicate replays
+        return save_history_ranges(row[1:7] for row in rows)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        existing = set()
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            cursor.execute(
+                "SELECT sync_id FROM barcode_history WHERE sync_id IN ("
+                + ", ".join(["%s"] * len(batch)) + ")",
+                [row[0] for row in batch]
+            )
+            existing.update(sync_id for (sync_id,) in cursor.fetchall())
+
+        new_rows = [row for row in rows if row[0] not in existing]
+        saved = _insert_batches(
+            cursor, "barcode_history",
+            ("sync_id", "barcode_data", "product_id", "location_id", "delivery_code",
+             "quantity", "start_serial", "end_serial", "created_at"),
+            ((sync_id, barcode_data, product_id, location_id, delivery_code,
+              end_serial - start_serial + 1, start_serial, end_serial, created_at)
+             for sync_id, barcode_data, product_id, location_id, delivery_code,
+                 start_serial, end_serial, created_at in new_rows),
+            batch_size
+        )
+
+        if get_schema_capabilities()["daily_rollup"]:
+            by_day = {}
+            for row in new_rows:
+                by_day.setdefault(str(row[7])[:10], []).append(
+                    (row[2], row[3], row[4], row[6] - row[5] + 1, row[6] - row[5] + 1))
+            for day, entries in by_day.items():
+                _update_daily_rollup(cursor, entries, day)
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return saved
+
+
+def expand_history_row(row: dict):
+    """Lazily yield one history dict per label in a history row.
+
+    Range rows are expanded to one entry per serial with quantity 1; single
+    label rows (including legacy rows without serial columns) are yielded as-is.
+    """
+    start_serial = row.get('start_serial')
+    end_serial = row.get('end_serial')
+    if start_serial is None or end_serial is None:
+        yield row
+        return
+
+    prefix = row['barcode_data'].rsplit("-", 1)[0]
+    for serial in range(start_serial, end_serial + 1):
+        label = dict(row)
+        label['barcode_data'] = f"{prefix}-{serial:04d}"
+        label['quantity'] = 1
+        label['start_serial'] = label['end_serial'] = serial
+        yield label
+
+
+def iter_history_labels(rows):
+    """Lazily expand history rows into one dict per printed label"""
+    for row in rows:
+        yield from expand_history_row(row)
+
+
+def _like_prefix(prefix: str) -> str:
+    """LIKE pattern matching values that start with prefix literally"""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def get_barcode_history(limit: int = HISTORY_PAGE_SIZE, before=None, prefix: Optional[str] = None,
+                        row_format: str = "dict"):
+    """Get recent barcode history with details, newest first.
+
+    before is an optional (created_at, id) cursor; only rows strictly older
+    than it are returned. Rows are ordered by (created_at, id) so the cursor
+    seeks straight into idx_created_at and every page costs the same.
+    prefix restricts the rows to barcodes starting with it (e.g.
+    "ISB-WALT BLCK-"), which is a range scan on idx_barcode_data. Range rows
+    match on their first barcode. row_format is one of ROW_FORMATS.
+    """
+    conditions = []
+    params = []
+    if prefix:
+        conditions.append("bh.barcode_data LIKE %s")
+        params.append(_like_prefix(prefix))
+    if before is not None:
+        conditions.append("(bh.created_at < %s OR (bh.created_at = %s AND bh.id < %s))")
+        params.extend((before[0], before[0], before[1]))
+    params.append(limit)
+    keyset = "WHERE " + " AND ".join(conditions) if conditions else ""
+    query = _statement("history_select").format(keyset=keyset)
+
+    conn = get_connection(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
     rows = cursor.fetchall()
-    history = rows_to_dicts(cursor, rows)
+    history = convert_rows(cursor, rows, row_format)
     cursor.close()
     conn.close()
     return history
 
 
-def get_history_by_date_range(start_date: str, end_date: str, limit: int = 1000):
+def get_barcode_history_page(limit: int = HISTORY_PAGE_SIZE, before=None,
+                             prefix: Optional[str] = None, row_format: str = "dict"):
+    """Get one page of history and the cursor for the next page.
+
+    Returns (rows, next_cursor); next_cursor is None when there are no more
+    rows. Pass next_cursor back as before to continue.
+    """
+    rows = get_barcode_history(limit, before, prefix, row_format)
+    if row_format == "columns":
+        if len(rows['id']) < limit:
+            return rows, None
+        return rows, (rows['created_at'][-1], rows['id'][-1])
+    if len(rows) < limit:
+        return rows, None
+    last = rows[-1]
+    if row_format == "tuple":
+        return rows, (last.created_at, last.id)
+    return rows, (last['created_at'], last['id'])
+
+
+def lookup_barcodes(codes, batch_size: int = HISTORY_BATCH_SIZE) -> dict:
+    """Resolve scanned barcodes to the history rows that printed them.
+
+    Returns {code: row} for every code found; codes never printed are left
+    out. A code matches a per-label row with the same barcode_data or a range
+    row whose first barcode shares its LOCATION-PRODUCT- prefix and whose
+    serials cover it. All codes sharing a prefix are resolved by one
+    idx_barcode_data range scan; when a code was printed more than once the
+    newest row wins.
+    """
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return {}
+
+    # prefix -> {serial: [codes]} for codes shaped like LOCATION-PRODUCT-NNNN
+    by_prefix = {}
+    for code in codes:
+        prefix, sep, serial = code.rpartition("-")
+        if sep and serial.isdigit():
+            by_prefix.setdefault(prefix + "-", {}).setdefault(int(serial), []).append(code)
+
+    ranges = get_schema_capabilities()["serial_ranges"]
+    columns = _statement("history_columns")
+    found = {}
+
+    def keep(code, row):
+        current = found.get(code)
+        if current is None or (row['created_at'], row['id']) > (current['created_at'], current['id']):
+            found[code] = row
+
+    conn = get_connection(read_only=True)
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(codes), batch_size):
+            batch = codes[i:i + batch_size]
+            conditions = ["bh.barcode_data IN (" + ", ".join(["%s"] * len(batch)) + ")"]
+            params = list(batch)
+            if ranges:
+                for prefix in {code.rpartition("-")[0] + "-" for code in batch} & by_prefix.keys():
+                    serials = by_prefix[prefix]
+                    conditions.append(
+                        "(bh.barcode_data LIKE %s AND bh.start_serial <= %s AND bh.end_serial >= %s)")
+                    params.extend((_like_prefix(prefix), max(serials), min(serials)))
+
+            cursor.execute(f'''
+                SELECT
+                    bh.id,
+                    bh.barcode_data,
+                    bh.quantity,
+                    bh.created_at,
+                    {columns},
+                    p.code as product_code,
+                    p.name as product_name,
+                    l.code as location_code,
+                    l.name as location_name
+                FROM barcode_history bh
+                LEFT JOIN products p ON bh.product_id = p.id
+                LEFT JOIN locations l ON bh.location_id = l.id
+                WHERE {" OR ".join(conditions)}
+            ''', params)
+
+            for row in rows_to_dicts(cursor, cursor.fetchall()):
+                if row['start_serial'] is None:
+                    keep(row['barcode_data'], row)
+                    continue
+                prefix = row['barcode_data'].rpartition("-")[0] + "-"
+                for serial, matches in by_prefix.get(prefix, {}).items():
+                    if row['start_serial'] <= serial <= row['end_serial']:
+                        for code in matches:
+                            keep(code, row)
+    finally:
+        cursor.close()
+        conn.close()
+    return {code: found[code] for code in codes if code in found}
+
+
+def get_history_by_date_range(start_date: str, end_date: str, limit: int = 1000,
+                              row_format: str = "dict"):
     """Get barcode history for a date range"""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT
@@ -388,98 +1692,362 @@ def get_history_by_date_range(start_date: str, end_date: str, limit: int = 1000)
         FROM barcode_history bh
         LEFT JOIN products p ON bh.product_id = p.id
         LEFT JOIN locations l ON bh.location_id = l.id
-        WHERE DATE(bh.created_at) BETWEEN %s AND %s
+        WHERE bh.created_at >= %s AND bh.created_at < %s
         ORDER BY bh.created_at DESC
         LIMIT %s
-    ''', (start_date, end_date, limit))
+    ''', (*_day_bounds(start_date, end_date), limit))
     rows = cursor.fetchall()
-    history = rows_to_dicts(cursor, rows)
+    history = convert_rows(cursor, rows, row_format)
     cursor.close()
     conn.close()
     return history
 
 
-def get_daily_stats(date: Optional[str] = None):
-    """Get daily statistics by delivery code"""
+def get_daily_stats(date: Optional[str] = None, end_date: Optional[str] = None,
+                    row_format: str = "dict"):
+    """Get statistics by delivery code for a day, or an inclusive day range"""
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
+    query = _statement("daily_stats")
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            SELECT
-                delivery_code,
-                COUNT(*) as total_labels,
-                SUM(quantity) as total_items
-            FROM barcode_history
-            WHERE DATE(created_at) = %s AND delivery_code IS NOT NULL
-            GROUP BY delivery_code
-            ORDER BY total_items DESC
-        ''', (date,))
-    except Error:
-        # Fallback for legacy schema
-        cursor.execute('''
-            SELECT
-                pk.name as packer_name,
-                COUNT(*) as total_labels,
-                SUM(bh.quantity) as total_items
-            FROM barcode_history bh
-            JOIN packers pk ON bh.packer_id = pk.id
-            WHERE DATE(bh.created_at) = %s
-            GROUP BY bh.packer_id, pk.name
-            ORDER BY total_items DESC
-        ''', (date,))
-
+    conn = get_connection(read_only=True)
+    cursor = _execute_prepared(conn, query, _day_bounds(date, end_date))
     rows = cursor.fetchall()
-    stats = rows_to_dicts(cursor, rows)
-    cursor.close()
+    stats = convert_rows(cursor, rows, row_format)
     conn.close()
     return stats
 
 
-def get_location_stats(date: Optional[str] = None):
-    """Get daily statistics by location"""
+def get_location_stats(date: Optional[str] = None, end_date: Optional[str] = None,
+                       row_format: str = "dict"):
+    """Get statistics by location for a day, or an inclusive day range"""
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
+    query = _statement("location_stats")
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT
-            l.code as location_code,
-            l.name as location_name,
-            COUNT(*) as total_labels,
-            SUM(bh.quantity) as total_items
-        FROM barcode_history bh
-        JOIN locations l ON bh.location_id = l.id
-        WHERE DATE(bh.created_at) = %s
-        GROUP BY bh.location_id, l.code, l.name
-        ORDER BY total_items DESC
-    ''', (date,))
+    conn = get_connection(read_only=True)
+    cursor = _execute_prepared(conn, query, _day_bounds(date, end_date))
     rows = cursor.fetchall()
-    stats = rows_to_dicts(cursor, rows)
-    cursor.close()
+    stats = convert_rows(cursor, rows, row_format)
     conn.close()
     return stats
 
 
+def load_snapshot(history_limit: int = HISTORY_PAGE_SIZE) -> dict:
+    """Everything the main window shows at startup, read over one connection.
+
+    Returns a dict with products, locations, location_stats (today),
+    history (the newest page) and history_cursor for the next page. The
+    product and location caches are primed with the rows read, so the UI's
+    next lookups need no further queries.
+    """
+    conn = get_connection(read_only=True)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT * FROM products ORDER BY name")
+        products = rows_to_dicts(cursor, cursor.fetchall())
+        cursor.execute("SELECT * FROM locations ORDER BY name")
+        locations = rows_to_dicts(cursor, cursor.fetchall())
+        cursor.execute(_statement("location_stats"), _day_bounds(datetime.now().strftime("%Y-%m-%d")))
+        location_stats = rows_to_dicts(cursor, cursor.fetchall())
+        cursor.execute(_statement("history_select").format(keyset=""), (history_limit,))
+        history = rows_to_dicts(cursor, cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+    products_cache.prime(products)
+    locations_cache.prime(locations)
+    history_cursor = None
+    if len(history) == history_limit:
+        history_cursor = (history[-1]['created_at'], history[-1]['id'])
+    return {
+        "products": products,
+        "locations": locations,
+        "location_stats": location_stats,
+        "history": history,
+        "history_cursor": history_cursor,
+    }
+
+
 def get_product_by_code(code: str):
     """Get product by code"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products WHERE code = %s", (code.upper(),))
-    row = cursor.fetchone()
-    product = row_to_dict(cursor, row)
-    cursor.close()
+    conn = get_connection(read_only=True)
+    cursor = _execute_prepared(conn, "SELECT * FROM products WHERE code = %s", (code.upper(),))
+    rows = cursor.fetchall()
+    product = row_to_dict(cursor, rows[0] if rows else None)
     conn.close()
     return product
 
 
+# ============== SERIAL COUNTERS ==============
+
+def reserve_serials(location_id: int, product_id: int, count: int) -> int:
+    """Atomically reserve count consecutive serials and return the first.
+
+    The counter row is created or advanced by a single upsert that stores the
+    previous value in LAST_INSERT_ID(), so concurrent stations always get
+    disjoint blocks without a separate SELECT ... FOR UPDATE round trip.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    conn = get_connection()
+    try:
+        start = _execute_prepared(conn, '''
+            INSERT INTO serial_counters (location_id, product_id, next_serial)
+            VALUES (%s, %s, LAST_INSERT_ID(1) + %s)
+            ON DUPLICATE KEY UPDATE next_serial = LAST_INSERT_ID(next_serial) + %s
+        ''', (location_id, product_id, count, count)).lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    return start
+
+
+def claim_serials(location_id: int, product_id: int, end_serial: int):
+    """Move the counter past a manually chosen block ending at end_serial"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            INSERT INTO serial_counters (location_id, product_id, next_serial)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE next_serial = GREATEST(next_serial, VALUES(next_serial))
+        ''', (location_id, product_id, end_serial + 1))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ============== PARTITION MAINTENANCE ==============
+
+def maintain_history_partitions(months_ahead: int = HISTORY_PARTITIONS_AHEAD) -> int:
+    """Make sure monthly partitions exist up to months_ahead months from now.
+
+    New months are split off the empty pmax partition, which is instant.
+    Stations starting at the same time take turns on a named lock and read
+    the partition list under it. Returns the number of partitions added (0
+    when not partitioned or another station added them).
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK('barcode_history_partitions', 10)")
+        if not cursor.fetchone()[0]:
+            return 0
+        try:
+            partitions = [name for name in _history_partitions(cursor) if name != "pmax"]
+            if not partitions:
+                return 0
+            last = partitions[-1][1:]
+            next_month = _add_months(date(int(last[:4]), int(last[4:]), 1), 1)
+            months = _months_between(next_month, _add_months(_month_start(date.today()), months_ahead))
+            if months:
+                try:
+                    cursor.execute(
+                        "ALTER TABLE barcode_history REORGANIZE PARTITION pmax INTO ("
+                        + ", ".join(_partition_definition(month) for month in months)
+                        + ", PARTITION pmax VALUES LESS THAN MAXVALUE)"
+                    )
+                except Error as e:
+                    # A station without the lock (older version) got there first
+                    if e.errno != errorcode.ER_SAME_NAME_PARTITION:
+                        raise
+                    return 0
+            return len(months)
+        finally:
+            cursor.execute("DO RELEASE_LOCK('barcode_history_partitions')")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def archive_history(retention_months: int = HISTORY_RETENTION_MONTHS,
+                    archive_dir: Optional[str] = None) -> list:
+    """Move monthly history partitions older than the retention window out of
+    barcode_history.
+
+    Each partition is copied either into the barcode_history_archive table or,
+    with archive_dir, into a gzip-compressed NDJSON file per month, and is
+    then dropped. Daily statistics are unaffected because they are served
+    from barcode_daily_rollup. Returns a list of (partition, rows) archived.
+    """
+    cutoff = f"p{_add_months(_month_start(date.today()), -retention_months):%Y%m}"
+    archived = []
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        old = [name for name in _history_partitions(cursor) if name != "pmax" and name < cutoff]
+        if old and archive_dir is None:
+            cursor.execute("CREATE TABLE IF NOT EXISTS barcode_history_archive LIKE barcode_history")
+            cursor.execute('''
+                SELECT COUNT(*) FROM information_schema.PARTITIONS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'barcode_history_archive'
+                  AND PARTITION_NAME IS NOT NULL
+            ''')
+            if cursor.fetchone()[0]:
+                cursor.execute("ALTER TABLE barcode_history_archive REMOVE PARTITIONING")
+            cursor.execute('''
+                SELECT h.COLUMN_NAME FROM information_schema.COLUMNS h
+                JOIN information_schema.COLUMNS a
+                  ON a.TABLE_SCHEMA = h.TABLE_SCHEMA AND a.TABLE_NAME = 'barcode_history_archive'
+                 AND a.COLUMN_NAME = h.COLUMN_NAME
+                WHERE h.TABLE_SCHEMA = DATABASE() AND h.TABLE_NAME = 'barcode_history'
+                ORDER BY h.ORDINAL_POSITION
+            ''')
+            columns = ", ".join(name for (name,) in cursor.fetchall())
+
+        for name in old:
+            if archive_dir is None:
+                cursor.execute(
+                    f"INSERT IGNORE INTO barcode_history_archive ({columns}) "
+                    f"SELECT {columns} FROM barcode_history PARTITION ({name})"
+                )
+                rows = cursor.rowcount
+                conn.commit()
+            else:
+                rows = _archive_partition_to_file(
+                    conn, name, os.path.join(archive_dir, f"barcode_history_{name[1:]}.ndjson.gz"))
+            cursor.execute(f"ALTER TABLE barcode_history DROP PARTITION {name}")
+            archived.append((name, rows))
+            print(f"Archived partition {name}: {rows} rows")
+    finally:
+        cursor.close()
+        conn.close()
+    return archived
+
+
+def _archive_partition_to_file(conn, partition: str, filename: str) -> int:
+    """Stream one partition to a gzip-compressed NDJSON file"""
+    written = 0
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT * FROM barcode_history PARTITION ({partition}) ORDER BY id")
+        columns = [col[0] for col in cursor.description]
+        with gzip.open(filename, "wt", encoding="utf-8") as f:
+            for row in cursor:
+                f.write(json.dumps(dict(zip(columns, row)), default=str))
+                f.write("\n")
+                written += 1
+    finally:
+        cursor.close()
+    return written
+
+
+# ============== EXPORT FUNCTIONS ==============
+
+EXPORT_FIELDS = ("barcode", "product", "location", "delivery", "qty", "created")
+
+
+def iter_history_export(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        location_id: Optional[int] = None, page_size: int = EXPORT_PAGE_SIZE):
+    """Stream history oldest first, one (barcode, product, location, delivery,
+    qty, created) tuple per printed label.
+
+    Pages through barcode_history by id (keyset) on an unbuffered cursor, so
+    memory stays constant however many rows match. Range rows are expanded to
+    one tuple per serial. Dates are inclusive YYYY-MM-DD bounds.
+    """
+    where = ["bh.id > %s"]
+    filters = []
+    if start_date:
+        where.append("bh.created_at >= %s")
+        filters.append(_day_bounds(start_date)[0])
+    if end_date:
+        where.append("bh.created_at < %s")
+        filters.append(_day_bounds(end_date)[1])
+    if location_id is not None:
+        where.append("bh.location_id = %s")
+        filters.append(location_id)
+
+    query = f'''
+        SELECT
+            bh.id,
+            bh.barcode_data,
+            p.name as product_name,
+            l.name as location_name,
+            bh.quantity,
+            bh.created_at,
+            {_statement("history_columns")}
+        FROM barcode_history bh
+        LEFT JOIN products p ON bh.product_id = p.id
+        LEFT JOIN locations l ON bh.location_id = l.id
+        WHERE {" AND ".join(where)}
+        ORDER BY bh.id
+        LIMIT %s
+    '''
+
+    last_id = 0
+    conn = get_connection(read_only=True)
+    try:
+        while True:
+            cursor = conn.cursor()
+            cursor.execute(query, (last_id, *filters, page_size))
+            fetched = 0
+            for (last_id, barcode_data, product_name, location_name, quantity,
+                 created_at, delivery_code, start_serial, end_serial) in cursor:
+                fetched += 1
+                if start_serial is None or end_serial is None:
+                    yield (barcode_data, product_name, location_name,
+                           delivery_code, quantity, created_at)
+                    continue
+                prefix = barcode_data.rsplit("-", 1)[0]
+                for serial in range(start_serial, end_serial + 1):
+                    yield (f"{prefix}-{serial:04d}", product_name, location_name,
+                           delivery_code, 1, created_at)
+            cursor.close()
+            if fetched < page_size:
+                break
+    finally:
+        conn.close()
+
+
+def export_history(filename: str, fmt: Optional[str] = None,
+                   start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   location_id: Optional[int] = None, progress=None,
+                   progress_every: int = 1000) -> int:
+    """Stream history to a CSV or gzip-compressed NDJSON file.
+
+    fmt is "csv" or "ndjson.gz"; by default it is chosen from the file name.
+    progress, if given, is called with the number of labels written so far
+    every progress_every labels; an exception it raises aborts the export.
+    Returns the number of labels written.
+    """
+    if fmt is None:
+        fmt = "ndjson.gz" if filename.endswith(".gz") else "csv"
+    if fmt not in ("csv", "ndjson.gz"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    written = 0
+    # Close the query as soon as the export stops, even when progress raises
+    with closing(iter_history_export(start_date, end_date, location_id)) as rows:
+        if fmt == "csv":
+            with open(filename, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow([field.title() for field in EXPORT_FIELDS])
+                for row in rows:
+                    writer.writerow(row)
+                    written += 1
+                    if progress is not None and written % progress_every == 0:
+                        progress(written)
+        else:
+            with gzip.open(filename, "wt", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str))
+                    f.write("\n")
+                    written += 1
+                    if progress is not None and written % progress_every == 0:
+                        progress(written)
+    return written
+
+
 def test_connection():
     """Test database connection"""
     try:
-        conn = get_connection()
+        conn = get_connection(read_only=True)
         cursor = conn.cursor()
         cursor.execute("SELECT 1")
         cursor.fetchone()
@@ -490,10 +2058,54 @@ def test_connection():
         return False, f"Connection failed: {e}"
 
 
-# Initialize database on import
-if __name__ != "__main__":
-    try:
-        init_database()
-    except Exception as e:
-        print(f"Warning: Could not initialize database: {e}")
-        print("Please ensure MySQL server is running and credentials are correct.")
+def main(argv=None):
+    """Command line maintenance tasks"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Barcode database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="Create the database and apply pending schema migrations")
+
+    backfill = commands.add_parser("backfill-rollup",
+                                   help="Rebuild barcode_daily_rollup from barcode_history")
+    backfill.add_argument("--start", help="First day to rebuild (YYYY-MM-DD), default all days still in history")
+    backfill.add_argument("--end", help="Last day to rebuild (YYYY-MM-DD), default --start")
+
+    archive = commands.add_parser("archive",
+                                  help="Move history partitions older than the retention window out")
+    archive.add_argument("--months", type=int, default=HISTORY_RETENTION_MONTHS,
+                         help=f"Months of history to keep (default {HISTORY_RETENTION_MONTHS})")
+    archive.add_argument("--to-dir", help="Write .ndjson.gz files here instead of barcode_history_archive")
+
+    args = parser.parse_args(argv)
+
+    init_database()
+    maintain_history_partitions()
+    if args.command == "migrate":
+        print(f"Schema is at version {SCHEMA_VERSION}")
+    elif args.command == "backfill-rollup":
+        written = rebuild_daily_rollup(args.start, args.end)
+        print(f"Rollup rebuilt: {written} rows written")
+    elif args.command == "archive":
+        if args.to_dir:
+            os.makedirs(args.to_dir, exist_ok=True)
+        archived = archive_history(args.months, args.to_dir)
+        print(f"Archived {len(archived)} partitions, {sum(rows for _, rows in archived)} rows")
+
+
+# Time every public database function (pure helpers and plumbing excepted)
+_UNINSTRUMENTED = {
+    "get_connection", "get_connection_without_db", "close_pool", "get_schema_capabilities",
+    "row_to_dict", "rows_to_dicts", "convert_rows", "build_history_ranges",
+    "expand_history_row", "iter_history_labels", "set_snapshot_store",
+    "invalidate_reference_cache", "query_stats", "reset_query_stats", "main",
+}
+for _name, _func in list(globals().items()):
+    if (inspect.isfunction(_func) and _func.__module__ == __name__
+            and not _name.startswith("_") and _name not in _UNINSTRUMENTED):
+        globals()[_name] = _instrument(_name, _func)
+
+
+if __name__ == "__main__":
+    main()
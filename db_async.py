@@ -0,0 +1,87 @@
+"""
+Asynchronous facade over the database module for the Tk GUI
+Database calls run on a small thread pool; completion callbacks are delivered
+on the Tk thread through root.after polling
+"""
+
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import database
+from config import DB_WORKER_THREADS
+
+
+class AsyncDatabase:
+    """Futures-returning wrapper around database.py.
+
+    Either submit any callable:
+
+        adb.submit(db.products_cache.all, callback=self._show_products)
+
+    or call database functions by name with the same arguments:
+
+        adb.get_location_stats(callback=self._show_stats, errback=self._show_error)
+
+    Both return a concurrent.futures.Future. callback(result) or
+    errback(exception) runs on the Tk thread, so it may touch widgets.
+    Failures without an errback go to error_handler.
+    """
+
+    def __init__(self, root, workers: int = DB_WORKER_THREADS, poll_ms: int = 50,
+                 error_handler: Optional[Callable] = None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.error_handler = error_handler
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self._completed = queue.Queue()
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, func: Callable, *args, callback: Optional[Callable] = None,
+               errback: Optional[Callable] = None, **kwargs) -> Future:
+        """Run func(*args, **kwargs) on the pool"""
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda f: self._completed.put((f, callback, errback)))
+        return future
+
+    def __getattr__(self, name):
+        func = getattr(database, name)
+        if not callable(func):
+            raise AttributeError(name)
+
+        def call(*args, callback=None, errback=None, **kwargs):
+            return self.submit(func, *args, callback=callback, errback=errback, **kwargs)
+        call.__name__ = name
+        return call
+
+    def _poll(self):
+        """Deliver finished calls on the Tk thread"""
+        while True:
+            try:
+                future, callback, errback = self._completed.get_nowait()
+            except queue.Empty:
+                break
+            if future.cancelled():
+                continue
+            error = future.exception()
+            try:
+                if error is None:
+                    if callback is not None:
+                        callback(future.result())
+                elif errback is not None:
+                    errback(error)
+                elif self.error_handler is not None:
+                    self.error_handler(error)
+                else:
+                    print(f"Database call failed: {error}")
+            except Exception as e:
+                # A failing callback must not stop delivery of the others
+                print(f"Error in database callback: {e}")
+        if not self._closed:
+            self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self):
+        """Stop accepting work and drop calls that have not started yet"""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,279 @@
+"""
+Local SQLite store for offline operation
+Records printed history at local-disk latency and uploads it to MySQL in the
+background; also keeps snapshots of reference data for offline reads
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+from config import LOCAL_STORE_PATH, SYNC_INTERVAL, HISTORY_BATCH_SIZE, HISTORY_QUEUE_SIZE
+
+
+class LocalStore:
+    """SQLite-backed write buffer with a background sync thread.
+
+    History ranges are appended to pending_history with a client-generated
+    sync_id and the time they were printed. The sync thread hands pending
+    rows to a push callable (normally database.sync_history_ranges) and only
+    deletes them once the push returns, so rows are never lost and a push
+    that is retried after a failure is de-duplicated by sync_id on the server.
+
+    A range that continues the newest pending row (same product, location,
+    delivery code and day, next serial) extends that row instead of adding
+    one, as long as no sync has read the row yet. Recording does not wake
+    the sync thread, so rows wait up to interval seconds and a print run
+    uploads one row per contiguous range; call sync_soon() when a run ends.
+    """
+
+    def __init__(self, path: str = LOCAL_STORE_PATH, interval: float = SYNC_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.last_sync_error = None
+        self.last_synced_at = None
+        # Highest seq that may already have been pushed; those rows must keep
+        # their sync_id and range (set from the table below)
+        self._claimed_seq = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pending_history (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                sync_id TEXT NOT NULL UNIQUE,
+                barcode_data TEXT NOT NULL,
+                product_id INTEGER,
+                location_id INTEGER,
+                delivery_code TEXT,
+                start_serial INTEGER NOT NULL,
+                end_serial INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS reference_snapshot (
+                name TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                saved_at TEXT NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        # Rows left from an earlier run may have reached the server before
+        # they were deleted here, so they are never extended
+        self._claimed_seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM pending_history").fetchone()[0]
+
+    # ===== HISTORY =====
+
+    def record_history_ranges(self, ranges) -> int:
+        """Queue (barcode, product_id, location_id, delivery_code, start, end)
+        ranges for upload. Returns the number of ranges recorded."""
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ranges = list(ranges)
+        if not ranges:
+            return 0
+        with self._lock:
+            last = self._conn.execute('''
+                SELECT seq, product_id, location_id, delivery_code, end_serial, created_at
+                FROM pending_history WHERE seq > ? ORDER BY seq DESC LIMIT 1
+            ''', (self._claimed_seq,)).fetchone()
+            for barcode_data, product_id, location_id, delivery_code, start, end in ranges:
+                if (last is not None
+                        and tuple(last[1:4]) == (product_id, location_id, delivery_code)
+                        and start == last[4] + 1
+                        and last[5][:10] == created_at[:10]):
+                    self._conn.execute("UPDATE pending_history SET end_serial = ? WHERE seq = ?",
+                                       (end, last[0]))
+                    last = (*last[:4], end, last[5])
+                    continue
+                cursor = self._conn.execute('''
+                    INSERT INTO pending_history
+                        (sync_id, barcode_data, product_id, location_id, delivery_code,
+                         start_serial, end_serial, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (uuid.uuid4().hex, barcode_data, product_id, location_id, delivery_code,
+                      start, end, created_at))
+                last = (cursor.lastrowid, product_id, location_id, delivery_code, end, created_at)
+            self._conn.commit()
+        return len(ranges)
+
+    def pending_count(self) -> int:
+        """Number of history ranges not yet uploaded"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_history").fetchone()[0]
+
+    def sync_once(self, push: Callable, batch_size: int = HISTORY_BATCH_SIZE) -> int:
+        """Upload pending history in batches until the queue is empty.
+
+        Exceptions from push propagate and leave the failed batch queued.
+        Returns the number of ranges uploaded.
+        """
+        synced = 0
+        while True:
+            with self._lock:
+                batch = self._conn.execute('''
+                    SELECT seq, sync_id, barcode_data, product_id, location_id,
+                           delivery_code, start_serial, end_serial, created_at
+                    FROM pending_history ORDER BY seq LIMIT ?
+                ''', (batch_size,)).fetchall()
+                if batch:
+                    self._claimed_seq = max(self._claimed_seq, batch[-1][0])
+            if not batch:
+                return synced
+
+            push([row[1:] for row in batch])
+
+            with self._lock:
+                self._conn.execute("DELETE FROM pending_history WHERE seq <= ?", (batch[-1][0],))
+                self._conn.commit()
+            synced += len(batch)
+            self.last_synced_at = datetime.now()
+
+    def sync_soon(self):
+        """Wake the sync thread now instead of at the next interval"""
+        self._wake.set()
+
+    def start(self, push: Callable):
+        """Start uploading pending history in a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(push,), daemon=True)
+        self._thread.start()
+
+    def _run(self, push: Callable):
+        delay = self.interval
+        while not self._stop.is_set():
+            try:
+                self.sync_once(push)
+                self.last_sync_error = None
+                delay = self.interval
+            except Exception as e:
+                # Back off while the server is unreachable
+                self.last_sync_error = str(e)
+                delay = min(delay * 2, self.interval * 12)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def stop(self, push: Optional[Callable] = None, timeout: float = 10):
+        """Stop the sync thread, optionally attempting a final upload"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        if push is not None:
+            try:
+                self.sync_once(push)
+            except Exception as e:
+                # Rows stay queued for the next start
+                self.last_sync_error = str(e)
+
+    # ===== REFERENCE SNAPSHOTS =====
+
+    def save_reference_snapshot(self, name: str, rows: list):
+        """Persist the latest copy of a reference table"""
+        data = json.dumps(rows, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reference_snapshot (name, data, saved_at) VALUES (?, ?, ?)",
+                (name, data, datetime.now().isoformat(timespec="seconds"))
+            )
+            self._conn.commit()
+
+    def load_reference_snapshot(self, name: str) -> Optional[list]:
+        """Return the saved rows for a reference table, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM reference_snapshot WHERE name = ?", (name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+class HistoryWriter:
+    """Write-behind queue between the print loop and the history store.
+
+    put() returns as soon as the record is queued; a dedicated thread drains
+    up to batch_size records at a time and hands them to sink in one call.
+    The queue is bounded, so a stalled sink makes put() block instead of
+    growing memory without limit. close() flushes everything still queued;
+    put() after close() raises RuntimeError rather than queueing a record
+    that would never be written.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink: Callable, max_pending: int = HISTORY_QUEUE_SIZE,
+                 batch_size: int = HISTORY_BATCH_SIZE):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.last_error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._put_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        """Queue one record, blocking while the backlog is full"""
+        with self._put_lock:
+            if self._closed:
+                raise RuntimeError("history writer is closed")
+            self._queue.put(record)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            taken = [self._queue.get()]
+            while len(taken) < self.batch_size:
+                try:
+                    taken.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [record for record in taken if record is not self._STOP]
+            stopping = len(batch) < len(taken)
+
+            while batch:
+                try:
+                    self.sink(batch)
+                    self.last_error = None
+                    break
+                except Exception as e:
+                    # Keep the batch and retry; records must not be dropped
+                    self.last_error = str(e)
+                    time.sleep(1)
+
+            for _ in taken:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        self._queue.join()
+
+    def close(self, timeout: float = 30):
+        """Write everything still queued and stop the writer thread"""
+        with self._put_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(self._STOP)
+        self._thread.join(timeout)
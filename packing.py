@@ -0,0 +1,373 @@
+"""
+Carton packing for cart exports
+Capacity rules per product type, the carton plan format shared by the PDF
+generators, and the packers that produce it
+"""
+
+import time
+
+from config import PACKING_TIME_BUDGET
+
+# Carton capacity per product type (items per carton)
+CARTON_CAPACITIES = {
+    "WALT": 150,      # Wallet - 150 per carton
+    "4PCS": 80,       # 4PC Set - 80 per carton
+    "LAPB": 12,       # Laptop Bag - 12 per carton
+}
+
+
+def get_carton_capacity(product_code):
+    """Get carton capacity for a product based on its code prefix."""
+    for prefix, capacity in CARTON_CAPACITIES.items():
+        if product_code.startswith(prefix):
+            return capacity
+    return 100  # Default capacity
+
+
+def get_product_type(product_code):
+    """Get product type prefix for grouping (WALT, 4PCS, LAPB, or OTHER)."""
+    for prefix in CARTON_CAPACITIES.keys():
+        if product_code.startswith(prefix):
+            return prefix
+    return "OTHER"
+
+
+class CartonPlan:
+    """Carton packing plan with runs of identical full cartons stored once.
+
+    Each entry is (count, carton). For count > 1 the carton is the first of
+    count full single-product cartons whose serials continue by capacity,
+    so a 150,000-wallet order is one entry instead of 1,000 dicts. Iterating
+    the plan yields the individual carton dicts lazily; len() and
+    mixed_count are computed from the entries.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._total = 0
+
+    def add(self, carton, count=1):
+        if count > 0:
+            self.entries.append((count, carton))
+            self._total += count
+
+    def __len__(self):
+        return self._total
+
+    def __iter__(self):
+        for count, carton in self.entries:
+            if count == 1:
+                yield carton
+                continue
+            item = carton['items'][0]
+            for j in range(count):
+                start = item['start_serial'] + j * carton['capacity']
+                yield dict(carton, items=[dict(item, start_serial=start,
+                                               end_serial=start + carton['capacity'] - 1)])
+
+    def runs(self):
+        """Yield (first_carton_number, count, first_carton, last_carton) per entry"""
+        number = 1
+        for count, carton in self.entries:
+            last = carton
+            if count > 1:
+                item = carton['items'][0]
+                start = item['start_serial'] + (count - 1) * carton['capacity']
+                last = dict(carton, items=[dict(item, start_serial=start,
+                                                end_serial=start + carton['capacity'] - 1)])
+            yield number, count, carton, last
+            number += count
+
+    @property
+    def mixed_count(self):
+        return sum(count for count, carton in self.entries if carton['is_mixed'])
+
+
+def _group_by_type(cart_items):
+    """Cart items grouped by product type, in order of first appearance"""
+    items_by_type = {}
+    for item in cart_items:
+        items_by_type.setdefault(get_product_type(item['product']['code']), []).append(item)
+    return items_by_type
+
+
+def _pack_full_cartons(plan, items, capacity, product_type):
+    """Add each item's full single-product cartons to plan as one run.
+
+    Returns the remainders that don't fill a complete carton.
+    """
+    remainders = []  # Items that don't fill a complete carton
+
+    # Process each item - fill complete cartons first
+    for item in items:
+        product_code = item['product']['code']
+        product_name = item['product']['name']
+        location_code = item['location']['code']
+        start_serial = item['start_serial']
+        end_serial = item['end_serial']
+
+        # Full cartons with this single product, as one run
+        full_cartons, remaining_qty = divmod(end_serial - start_serial + 1, capacity)
+        plan.add({
+            'items': [{
+                'product_code': product_code,
+                'product_name': product_name,
+                'start_serial': start_serial,
+                'end_serial': start_serial + capacity - 1,
+                'quantity': capacity,
+                'location_code': location_code
+            }],
+            'capacity': capacity,
+            'total_quantity': capacity,
+            'is_mixed': False,
+            'product_type': product_type
+        }, full_cartons)
+
+        if remaining_qty:
+            # Remainder - save for mixing
+            remainders.append({
+                'product_code': product_code,
+                'product_name': product_name,
+                'start_serial': start_serial + full_cartons * capacity,
+                'end_serial': end_serial,
+                'quantity': remaining_qty,
+                'location_code': location_code
+            })
+
+    return remainders
+
+
+def pack_cartons_smart(cart_items):
+    """Pack items into cartons with smart mixing.
+
+    Strategy:
+    1. Group items by product type (WALT, 4PCS, LAPB, etc.)
+    2. For each type, first fill complete cartons with single products
+    3. Collect remaining items that don't fill a complete carton
+    4. Mix remaining items of same type into shared cartons
+
+    Complete cartons are counted arithmetically and recorded as one run per
+    item, so planning time depends on the number of cart items, not on
+    their quantities.
+
+    Returns a CartonPlan; iterating it yields carton dicts, each containing:
+    - items: list of {product_code, product_name, start_serial, end_serial, quantity, location_code}
+    - capacity: carton capacity
+    - total_quantity: total items in carton
+    - is_mixed: True if carton contains multiple products
+    """
+    all_cartons = CartonPlan()
+
+    for product_type, items in _group_by_type(cart_items).items():
+        capacity = get_carton_capacity(items[0]['product']['code'])
+        remainders = _pack_full_cartons(all_cartons, items, capacity, product_type)
+
+        # Now pack remainders into mixed cartons
+        for carton_items in _next_fit(remainders, capacity):
+            all_cartons.add(_carton(carton_items, capacity, product_type))
+
+    return all_cartons
+
+
+def _carton(carton_items, capacity, product_type):
+    return {
+        'items': carton_items,
+        'capacity': capacity,
+        'total_quantity': sum(i['quantity'] for i in carton_items),
+        'is_mixed': len(set(i['product_code'] for i in carton_items)) > 1,
+        'product_type': product_type
+    }
+
+
+def _take(piece, quantity):
+    """Split quantity labels off the front of a remainder: (head, tail)"""
+    split = piece['start_serial'] + quantity
+    return (dict(piece, end_serial=split - 1, quantity=quantity),
+            dict(piece, start_serial=split, quantity=piece['quantity'] - quantity))
+
+
+def _next_fit(remainders, capacity):
+    """Fill cartons with remainders in cart order, splitting at carton boundaries"""
+    cartons = []
+    current, room = [], capacity
+    for piece in remainders:
+        while piece['quantity'] > room:
+            if room:
+                head, piece = _take(piece, room)
+                current.append(head)
+            cartons.append(current)
+            current, room = [], capacity
+        current.append(piece)
+        room -= piece['quantity']
+    if current:
+        cartons.append(current)
+    return cartons
+
+
+# ===== PACKING SOLVER =====
+
+# Remainder ranges above which the exact search is not attempted
+_EXACT_MAX_RANGES = 40
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def pack_cartons(cart_items, time_budget: float = PACKING_TIME_BUDGET):
+    """Pack items into the fewest cartons, then the fewest mixed cartons.
+
+    Uses the same rules as pack_cartons_smart (one product type per carton,
+    CARTON_CAPACITIES, full single-product cartons first) and returns a
+    CartonPlan in the same format. The remainders of each type are packed
+    to minimise, in order:
+    1. total cartons - always ceil(remainder / capacity), as ranges may split
+    2. mixed cartons - products whose remainders fit the spare room of the
+       type are given a carton of their own
+    3. serial ranges listed - first-fit-decreasing, then an exact search for
+       a packing without splits, before ranges are split into the gaps
+
+    The next-fit packing of pack_cartons_smart is scored as well, so the
+    result is never worse than it. The exact search stops after time_budget
+    seconds (shared by all types) and the best packing found so far is used.
+    """
+    deadline = time.perf_counter() + time_budget
+    plan = CartonPlan()
+
+    for product_type, items in _group_by_type(cart_items).items():
+        capacity = get_carton_capacity(items[0]['product']['code'])
+        remainders = _pack_full_cartons(plan, items, capacity, product_type)
+        candidates = [
+            _pack_by_product(remainders, capacity, deadline, combine=True),
+            _pack_by_product(remainders, capacity, deadline, combine=False),
+            _next_fit(remainders, capacity),
+        ]
+        for carton_items in min(candidates, key=_packing_cost):
+            plan.add(_carton(carton_items, capacity, product_type))
+
+    return plan
+
+
+def _packing_cost(cartons):
+    """(cartons, mixed cartons, serial ranges) - lower is better, in that order"""
+    mixed = sum(1 for c in cartons if len(set(i['product_code'] for i in c)) > 1)
+    return len(cartons), mixed, sum(len(c) for c in cartons)
+
+
+def _pack_by_product(remainders, capacity, deadline, combine):
+    """Pack remainders keeping as many products as possible out of mixed cartons.
+
+    With combine, remainders of one product that add up to a full carton are
+    packed together first; that can save a mixed carton but may split a range.
+    """
+    by_code = {}
+    for piece in remainders:
+        by_code.setdefault(piece['product_code'], []).append(piece)
+
+    cartons = []
+    leftovers = {}
+    for code, pieces in by_code.items():
+        if combine and sum(p['quantity'] for p in pieces) >= capacity:
+            full = _next_fit(pieces, capacity)
+            if sum(i['quantity'] for i in full[-1]) < capacity:
+                pieces = full.pop()
+            else:
+                pieces = []
+            cartons.extend(full)
+        if pieces:
+            leftovers[code] = pieces
+
+    sizes = {code: sum(p['quantity'] for p in pieces) for code, pieces in leftovers.items()}
+    needed = -(-sum(sizes.values()) // capacity)
+    spare = needed * capacity - sum(sizes.values())
+
+    # A product packed alone leaves capacity - size empty; the most products
+    # fit in the spare room when the largest go alone first
+    alone = []
+    for code in sorted((c for c in sizes if sizes[c] <= capacity), key=sizes.get, reverse=True):
+        if capacity - sizes[code] > spare:
+            break
+        spare -= capacity - sizes[code]
+        alone.append(code)
+    cartons.extend(leftovers[code] for code in alone)
+
+    rest = [piece for code, pieces in leftovers.items() if code not in alone for piece in pieces]
+    if rest:
+        cartons.extend(_pack_mixed(rest, needed - len(alone), capacity, deadline))
+    return cartons
+
+
+def _pack_mixed(pieces, count, capacity, deadline):
+    """Pack ranges into count cartons with as few split ranges as possible"""
+    sizes = [p['quantity'] for p in pieces]
+    assignment = _first_fit_decreasing(sizes, count, capacity)
+    if None in assignment and len(pieces) <= _EXACT_MAX_RANGES:
+        assignment = _exact_fit(sizes, count, capacity, deadline) or assignment
+
+    cartons = [[] for _ in range(count)]
+    room = [capacity] * count
+    for piece, index in zip(pieces, assignment):
+        if index is not None:
+            cartons[index].append(piece)
+            room[index] -= piece['quantity']
+
+    # Ranges that fit nowhere whole are split, largest gaps first
+    for piece in sorted((p for p, i in zip(pieces, assignment) if i is None),
+                        key=lambda p: p['quantity'], reverse=True):
+        while piece['quantity']:
+            index = max(range(count), key=room.__getitem__)
+            if piece['quantity'] > room[index]:
+                head, piece = _take(piece, room[index])
+            else:
+                head, piece = piece, dict(piece, quantity=0)
+            cartons[index].append(head)
+            room[index] -= head['quantity']
+    return cartons
+
+
+def _first_fit_decreasing(sizes, count, capacity):
+    """Carton index for each size, or None where it does not fit whole"""
+    room = [capacity] * count
+    assignment = [None] * len(sizes)
+    for i in sorted(range(len(sizes)), key=sizes.__getitem__, reverse=True):
+        for index in range(count):
+            if sizes[i] <= room[index]:
+                room[index] -= sizes[i]
+                assignment[i] = index
+                break
+    return assignment
+
+
+def _exact_fit(sizes, count, capacity, deadline):
+    """Carton index for each size with nothing split, or None.
+
+    Depth-first search over sizes in decreasing order; cartons with the same
+    load are interchangeable, so only the first of them is tried. Returns
+    None when no such packing exists or the deadline passes first.
+    """
+    order = sorted(range(len(sizes)), key=sizes.__getitem__, reverse=True)
+    loads = [0] * count
+    assignment = [None] * len(sizes)
+
+    def place(k):
+        if k == len(order):
+            return True
+        if time.perf_counter() > deadline:
+            raise _OutOfTime()
+        size = sizes[order[k]]
+        tried = set()
+        for index in range(count):
+            if loads[index] in tried or loads[index] + size > capacity:
+                continue
+            tried.add(loads[index])
+            loads[index] += size
+            assignment[order[k]] = index
+            if place(k + 1):
+                return True
+            loads[index] -= size
+        return False
+
+    try:
+        return assignment if place(0) else None
+    except _OutOfTime:
+        return None
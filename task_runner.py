@@ -0,0 +1,127 @@
+"""
+Background task runner for long-running GUI actions
+Each task runs on its own worker thread and reports progress; results,
+errors and progress updates are marshalled to the Tk thread with root.after
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when the operator cancelled it"""
+
+
+class Task:
+    """Handle passed to the task function and returned to the caller.
+
+    The task function reports with progress(done, total, message); progress
+    raises TaskCancelled once cancel() has been called, so long loops stop at
+    the next report. Functions that want to wind down themselves can poll
+    the cancelled property instead.
+    """
+
+    def __init__(self, title: str):
+        self.title = title
+        self.done = 0
+        self.total = None
+        self.message = ""
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    def progress(self, done: int, total: Optional[int] = None, message: str = ""):
+        self.done = done
+        self.total = total
+        self.message = message
+        if self._cancel.is_set():
+            raise TaskCancelled(self.title)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the task function has returned; False on timeout"""
+        return self._finished.wait(timeout)
+
+
+class TaskRunner:
+    """Runs func(task, *args, **kwargs) on a worker thread.
+
+    on_done(result) or on_error(exception) is called on the Tk thread when
+    the task finishes; a cancelled task reports TaskCancelled to on_error.
+    Errors without an on_error go to error_handler. on_change() is called on
+    the Tk thread whenever the set of running tasks or their progress may
+    have changed, so the UI can redraw its progress display.
+    """
+
+    def __init__(self, root, on_change: Optional[Callable] = None,
+                 error_handler: Optional[Callable] = None, poll_ms: int = 100):
+        self.root = root
+        self.on_change = on_change
+        self.error_handler = error_handler
+        self.poll_ms = poll_ms
+        self.tasks = []
+        self._finished = queue.Queue()
+        self.root.after(self.poll_ms, self._poll)
+
+    def run(self, title: str, func: Callable, *args, on_done: Optional[Callable] = None,
+            on_error: Optional[Callable] = None, **kwargs) -> Task:
+        task = Task(title)
+
+        def worker():
+            try:
+                result = func(task, *args, **kwargs)
+            except Exception as e:
+                self._finished.put((task, None, e, on_done, on_error))
+            else:
+                self._finished.put((task, result, None, on_done, on_error))
+            finally:
+                task._finished.set()
+
+        self.tasks.append(task)
+        threading.Thread(target=worker, name=f"task: {title}", daemon=True).start()
+        if self.on_change is not None:
+            self.on_change()
+        return task
+
+    def cancel_all(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def wait_all(self, timeout: float) -> bool:
+        """Block until every running task has returned; False on timeout"""
+        deadline = time.monotonic() + timeout
+        return all(task.wait(max(0, deadline - time.monotonic())) for task in list(self.tasks))
+
+    def _poll(self):
+        while True:
+            try:
+                task, result, error, on_done, on_error = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self.tasks.remove(task)
+            try:
+                if error is None:
+                    if on_done is not None:
+                        on_done(result)
+                elif on_error is not None:
+                    on_error(error)
+                elif isinstance(error, TaskCancelled):
+                    pass
+                elif self.error_handler is not None:
+                    self.error_handler(task, error)
+                else:
+                    print(f"Task '{task.title}' failed: {error}")
+            except Exception as e:
+                # A failing callback must not stop the poll loop
+                print(f"Error in task callback: {e}")
+
+        if self.on_change is not None:
+            self.on_change()
+        self.root.after(self.poll_ms, self._poll)
@@ -0,0 +1,150 @@
+"""
+Virtualised Treeview for long lists
+Rows are kept as plain value tuples; only the rows that fit in the viewport
+exist as Treeview items, and scrolling rewrites their values in place
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Optional
+
+
+class VirtualTreeview:
+    """Treeview + scrollbar showing a window over a list of value tuples.
+
+    Scrolling, resizing and appending cost O(visible rows) however many rows
+    are buffered. on_near_end() is called when the view comes within
+    prefetch rows of the end of the buffer, so the owner can append the
+    next page. Configure headings and columns on the tree attribute.
+
+    The selection belongs to a buffered row, not to an item: it moves with
+    the data when scrolling, and Up/Down/Page Up/Page Down scroll the window
+    when the selection reaches its edge. Only one row can be selected.
+    """
+
+    def __init__(self, parent, columns, on_near_end: Optional[Callable] = None,
+                 prefetch: int = 50, **tree_options):
+        tree_options.setdefault("selectmode", "browse")
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", **tree_options)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.on_near_end = on_near_end
+        self.prefetch = prefetch
+        self.rows = []
+        self.offset = 0
+        self.visible = 1
+        self.selected = None
+        self._items = []
+        self._rendering = False
+
+        style = ttk.Style()
+        self.row_height = int(style.lookup("Treeview", "rowheight") or 20)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self.visible))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def clear(self):
+        self.rows = []
+        self.offset = 0
+        self.selected = None
+        self._render()
+
+    def append_rows(self, rows):
+        self.rows.extend(rows)
+        self._render()
+
+    def scroll(self, rows: int):
+        self._scroll_to(self.offset + rows)
+
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(offset, len(self.rows) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+        else:
+            self._check_near_end()
+
+    def _move_selection(self, rows: int):
+        """Keyboard navigation over the whole buffer, not just the shown items"""
+        if self.rows:
+            current = self.offset if self.selected is None else self.selected
+            self.selected = max(0, min(current + rows, len(self.rows) - 1))
+            if self.selected < self.offset:
+                self.offset = self.selected
+            elif self.selected >= self.offset + self.visible:
+                self.offset = self.selected - self.visible + 1
+            self._render()
+        return "break"
+
+    def _on_select(self, event):
+        # Clicks select an item; remember which buffered row it shows
+        selection = self.tree.selection()
+        if not self._rendering and selection:
+            self.selected = self.offset + self._items.index(selection[0])
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.rows)))
+        elif unit == "pages":
+            self.scroll(int(amount) * self.visible)
+        else:
+            self.scroll(int(amount))
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_resize(self, event):
+        # Heading height is the y of the first row when one is shown
+        top = self.tree.bbox(self._items[0])[1] if self._items and self.tree.bbox(self._items[0]) else 25
+        visible = max(1, (event.height - top) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = max(0, min(self.offset, len(self.rows) - self.visible))
+            self._render()
+
+    def _render(self):
+        window = self.rows[self.offset:self.offset + self.visible]
+
+        # Reuse existing items; only create or delete the difference
+        while len(self._items) < len(window):
+            self._items.append(self.tree.insert("", tk.END))
+        if len(self._items) > len(window):
+            self.tree.delete(*self._items[len(window):])
+            del self._items[len(window):]
+        for item_id, values in zip(self._items, window):
+            self.tree.item(item_id, values=values)
+
+        # Keep the selection on its row as the items are reused
+        self._rendering = True
+        try:
+            if self.selected is not None and self.offset <= self.selected < self.offset + len(window):
+                item_id = self._items[self.selected - self.offset]
+                self.tree.selection_set(item_id)
+                self.tree.focus(item_id)
+            elif self.tree.selection():
+                self.tree.selection_set(())
+        finally:
+            self._rendering = False
+
+        if self.rows:
+            self.scrollbar.set(self.offset / len(self.rows),
+                               (self.offset + len(window)) / len(self.rows))
+        else:
+            self.scrollbar.set(0, 1)
+        self._check_near_end()
+
+    def _check_near_end(self):
+        if self.on_near_end is not None and self.offset + self.visible >= len(self.rows) - self.prefetch:
+            self.on_near_end()